@@ -9,6 +9,9 @@ lss - LS Supplement
 # TODO: access errors
 # TODO: summary
 
+import collections
+import errno
+import itertools
 import logging
 import os
 import stat
@@ -17,10 +20,9 @@ import time
 from datetime import datetime
 from fnmatch import fnmatch
 import math
-import pwd
-import grp
 import pprint
 import pkg_resources
+from concurrent.futures import ThreadPoolExecutor
 
 from humanize import naturalsize
 from colorama import Fore, Style
@@ -28,7 +30,10 @@ from dateutil.relativedelta import relativedelta
 
 from .lscolor import indicator_glob, ls_color, filetypemap
 from .marker import get_markers, get_color
-from .util import is_iterable
+from .mounts import get_mounts, MountTable, MountTimeoutError
+from .aggregate import fmt_aggregate
+from .backend import OS
+from .util import is_iterable, user_name, group_name
 
 from . import marker_git
 
@@ -59,6 +64,49 @@ class Timeout:
             time.monotonic() - self.start_time, self.delay)
 
 
+class Budget:
+    """ Deterministic work budget counted in entries and directories.
+
+    Unlike Timeout the budget runs out at the same point on every run
+    over the same tree. A budget with a parent charges the parent too, and
+    is exhausted when either runs out. Zero limit means unlimited. """
+
+    def __init__(self, *, max_entries=0, max_dirs=0, parent=None,
+                 deadline=0):
+        self.max_entries = max_entries
+        self.max_dirs = max_dirs
+        self.parent = parent
+        self.deadline = deadline  # time.monotonic() limit, 0 is none
+        self.entries = 0
+        self.dirs = 0
+        self.stopped = False
+
+    def __bool__(self):
+        return bool(
+            self.stopped or
+            (self.max_entries and self.entries >= self.max_entries) or
+            (self.max_dirs and self.dirs >= self.max_dirs) or
+            (self.deadline and time.monotonic() >= self.deadline) or
+            self.parent)
+
+    def __str__(self):
+        return "Budget(entries=%d/%d, dirs=%d/%d)" % (
+            self.entries, self.max_entries, self.dirs, self.max_dirs)
+
+    def stop(self):
+        """ Exhaust budget, parent is not affected """
+        self.stopped = True
+
+    def spend(self, *, entries=0, dirs=0):
+        self.entries += entries
+        self.dirs += dirs
+        if self.parent is not None:
+            self.parent.spend(entries=entries, dirs=dirs)
+
+
+FS_ENCODING = sys.getfilesystemencoding()
+
+
 def is_tty(stream):
     """ Is stream TTY ? """
     isatty = getattr(stream, 'isatty', None)
@@ -69,16 +117,29 @@ def is_tty(stream):
 # fmt_attribute(item) -> iterable of (formatted_str, color)
 
 
+def escape_name(name):
+    """ Name safe to write: undecodable bytes as \\xNN, and control
+    characters escaped """
+    if name.isprintable():
+        return name
+    name = name.encode(FS_ENCODING, "surrogateescape").decode(
+        FS_ENCODING, "backslashreplace")
+    return "".join(c if c.isprintable() else (
+        "\\x%02x" % ord(c) if ord(c) < 0x100 else "\\u%04x" % ord(c))
+        for c in name)
+
+
 def fmt_name(item):
+    name = escape_name(item.name)
     # 1. resolve fnmatch
     for glob in indicator_glob:
         if fnmatch(item.name, glob):
-            return item.name, ls_color(glob)
+            return name, ls_color(glob)
     # 2. resolve fs type
     for pred, colorcode, in filetypemap:
         if pred(item.stat.st_mode):
             break
-    return [item.name, ls_color(colorcode)]
+    return [name, ls_color(colorcode)]
 
 # TODO ? new colorscale: seconds, minutes, hours, days, weeks, months, years
 # TODO % time alternative iso-datetime
@@ -148,7 +209,7 @@ def fmt_user(item):
         color = Fore.MAGENTA
     else:
         color = Fore.WHITE
-    return pwd.getpwuid(uid).pw_name, color
+    return user_name(uid), color
 
 
 def fmt_group(item):
@@ -161,34 +222,67 @@ def fmt_group(item):
         color = Fore.MAGENTA
     else:
         color = Fore.WHITE
-    return grp.getgrgid(gid).gr_name, color
+    return group_name(gid), color
 
 
 def fmt_inode(item):
-    return str(item.file.stat.st_ino), Style.NORMAL
+    ino = item.file.stat.st_ino
+    return str(ino) if ino else "", Style.NORMAL  # index has no inodes
 
 
 def fmt_symlink(item):
     if item.is_symlink():
         try:
-            return item.linked_path(), fmt_name(item.linked_file())[1]
+            return escape_name(item.linked_path()), \
+                fmt_name(item.linked_file())[1]
         except FileNotFoundError:
-            return item.linked_path(), ls_color("or")
+            return escape_name(item.linked_path()), ls_color("or")
     else:
         return None, None
 
 
+def fmt_budget(item):
+    if item.budget is None:
+        return "", Style.NORMAL
+    return "%de/%dd" % (item.budget.entries, item.budget.dirs), (
+        Fore.MAGENTA if item.budget else Style.NORMAL)
+
+
+def fmt_mount(item):
+    if item.mount is None:
+        return None, None
+    return "[%s]" % item.mount.fstype, (
+        Fore.YELLOW if item.mount.is_remote else Fore.CYAN)
+
+
 def fmt_markers(item):
     return tuple(
         (k, get_color(item.markers[k])) for k in sorted(item.markers.keys()))
 
 
+# column needs, traverse and listing skip work no column needs
+NEED_STAT = "stat"  # stat of every traversed entry, sizes and times
+NEED_LINK = "link"  # symlink targets
+NEED_MARKERS = "markers"  # directory markers
+NEED_ALL = frozenset((NEED_STAT, NEED_LINK, NEED_MARKERS))
+
+# listing column names in layout order
+FIELDS = ("inode", "perm", "user", "group", "count", "size", "complete",
+          "time", "markers", "budget", "mount", "name", "link")
+
+# adjacent columns written without space between, eg. "1.2K+"
+JOINED = frozenset((("size", "complete"), ("name", "link")))
+
+
 class Column:
-    def __init__(self, func, *, align="R", fill=" ", prefix=None):
+    def __init__(self, func, *, name="", align="R", fill=" ", prefix=None,
+                 needs=()):
         self.func = func
+        self.name = name
         self.align = align
         self.fill = fill
         self.prefix = prefix
+        self.needs = frozenset(needs)
         self.maxwidth = 0
 
 
@@ -207,78 +301,146 @@ class View:
 
 
 class Listing:
-    def __init__(self, *, show_inode=False, reverse=False, sort_key="name"):
+    def __init__(self, *, show_inode=False, show_budget=False, reverse=False,
+                 sort_key="name", aggregators=(), fields=None, top=0):
         self.hascolor = is_tty(sys.stdout)
         self.items = set()
+        self.held = []  # streamed links not written yet
         self.reverse = reverse
+        self.top = top
+        self.sort_key = sort_key
         self.sort_func = lambda item: getattr(item, sort_key)
 
         self.columns = [
-            Column(fmt_perm, align="L"),
-            Column(fmt_user),
-            Column(fmt_group),
-            Column(fmt_count),
-            Column(fmt_size, fill=""),
-            Column(fmt_complete),
-            Column(fmt_time),
-            Column(fmt_markers),
-            Column(fmt_name, align="", fill=""),
-            Column(fmt_symlink, align="", fill="", prefix=" -> ")
+            Column(fmt_perm, name="perm", align="L"),
+            Column(fmt_user, name="user"),
+            Column(fmt_group, name="group"),
+            Column(fmt_count, name="count"),
+            Column(fmt_size, name="size", needs=(NEED_STAT,)),
+            Column(fmt_complete, name="complete"),
+            Column(fmt_time, name="time", needs=(NEED_STAT,)),
+            Column(fmt_markers, name="markers", needs=(NEED_MARKERS,)),
+            Column(fmt_mount, name="mount"),
+            Column(fmt_name, name="name", align=""),
+            Column(fmt_symlink, name="link", align="", prefix=" -> ",
+                   needs=(NEED_LINK,))
         ]
         if show_inode:
-            self.columns.insert(0, Column(fmt_inode))
+            self.columns.insert(0, Column(fmt_inode, name="inode"))
+        if show_budget:
+            self.columns.insert(-3, Column(fmt_budget, name="budget"))
+        for index, aggregator in enumerate(aggregators):
+            self.columns.insert(-3, Column(fmt_aggregate(index),
+                                           name="by-" + aggregator.name,
+                                           needs=(NEED_STAT,)))
+        if fields is not None:
+            # shown columns in order of fields
+            by_name = {column.name: column for column in self.columns}
+            self.columns = [by_name[name] for name in fields
+                            if name in by_name]
+        for column, after in zip(self.columns, self.columns[1:] + [None]):
+            if after is None or (column.name, after.name) in JOINED:
+                column.fill = ""
+
+    @property
+    def needs(self):
+        """ What columns and sort need from traverse """
+        needs = set()
+        for column in self.columns:
+            needs |= column.needs
+        if self.sort_key in ("size", "mtime"):
+            needs.add(NEED_STAT)
+        return frozenset(needs)
 
     def add(self, item):
         self.items.add(item)
 
-    def list(self):
-        w = sys.stdout.write
+    def sections(self):
+        """ Items to sum up in aggregate.print_sections """
+        return self.items
 
-        columns = self.columns
-        rows = []  # row
+    def shown(self, rows):
+        """ Rows in listing order -> top rows, first by name, largest or
+        newest by size or time, reverse takes the other end """
+        if not self.top:
+            return rows
+        if self.sort_key == "name" or self.reverse:
+            return list(itertools.islice(rows, self.top))
+        return list(collections.deque(rows, maxlen=self.top))
 
+    def list(self):
         # sort items
         items = sorted(self.items, key=self.sort_func)
         if self.reverse:
             items.reverse()
+        items = self.shown(items)
+
+        if NEED_LINK in self.needs:
+            resolve_links(items)
 
         # format values and colors and find column maxwidth
-        for item in items:
-            row = []  # (value, color, width)
-            for column in self.columns:
-                specs = column.func(item) # call format function
-                if specs and not is_iterable(specs[0]):
-                    specs = [specs]
-                view = View()
-                for spec in specs:
-                    view.append(*spec)
-                row.append(view)
-                if view.width > column.maxwidth:
-                    column.maxwidth = view.width
-            rows.append(row)
+        rows = [self.format(item) for item in items]
 
         # write rows
         for row in rows:
-            last_fill = ""
-            for i, view in enumerate(row):
-                if view.width and columns[i].prefix:
-                    w(columns[i].prefix)
-                if columns[i].align == "R":  # align rigth
-                    w(" " * (columns[i].maxwidth - view.width))
-                for field in view.viewseq:
-                    if self.hascolor:
-                        w(field[1])  # color
-                        D("value=%r color=%r", field[0], field[1])
-                    w(field[0])  # value
-                    if self.hascolor:
-                        w(Style.RESET_ALL)
-                if columns[i].align == "L":  # align left
-                    w(" " * (columns[i].maxwidth - view.width))
-
-                if columns[i].maxwidth or not last_fill:
-                    w(columns[i].fill)  # fill to next
-                    last_fill = columns[i].fill
-            w("\n")
+            self.write(row)
+
+    def stream(self, item=None):
+        """ Write item now, aligned to columns of items written so far.
+        Links are held until LINK_BATCH of them or other item comes, to
+        resolve their targets together. Without item held links are
+        written. """
+        if isinstance(item, Link) and NEED_LINK in self.needs:
+            self.held.append(item)
+            if len(self.held) < LINK_BATCH:
+                return
+            item = None
+        if self.held:
+            resolve_links(self.held)
+            for link in self.held:
+                self.write(self.format(link))
+            self.held = []
+        if item is not None:
+            self.write(self.format(item))
+
+    def format(self, item):
+        """ Format item into row of views, and update column maxwidth """
+        row = []
+        for column in self.columns:
+            specs = column.func(item) # call format function
+            if specs and not is_iterable(specs[0]):
+                specs = [specs]
+            view = View()
+            for spec in specs:
+                view.append(*spec)
+            row.append(view)
+            if view.width > column.maxwidth:
+                column.maxwidth = view.width
+        return row
+
+    def write(self, row):
+        w = sys.stdout.write
+        columns = self.columns
+        last_fill = ""
+        for i, view in enumerate(row):
+            if view.width and columns[i].prefix:
+                w(columns[i].prefix)
+            if columns[i].align == "R":  # align rigth
+                w(" " * (columns[i].maxwidth - view.width))
+            for field in view.viewseq:
+                if self.hascolor:
+                    w(field[1])  # color
+                    D("value=%r color=%r", field[0], field[1])
+                w(field[0])  # value
+                if self.hascolor:
+                    w(Style.RESET_ALL)
+            if columns[i].align == "L":  # align left
+                w(" " * (columns[i].maxwidth - view.width))
+
+            if columns[i].maxwidth or not last_fill:
+                w(columns[i].fill)  # fill to next
+                last_fill = columns[i].fill
+        w("\n")
 
 
 class Item:
@@ -286,6 +448,9 @@ class Item:
 
     complete = True
     count = 0
+    budget = None
+    mount = None  # Mount if item is mount point
+    aggregators = ()
 
     def __init__(self, file):
         self.file = file
@@ -306,7 +471,7 @@ class Item:
 
     @property
     def path(self):
-        return self.file.path
+        return os.fsdecode(self.file.path)
 
     @property
     def stat(self):
@@ -359,6 +524,7 @@ class Dir(Item):
     count = 0
     complete = False
     _mtime = 0
+    _partial = False  # some subtree was cut short or is not complete
 
     def __init__(self, file):
         super().__init__(file)
@@ -377,46 +543,130 @@ class Dir(Item):
         self.count += 1
         if file.mtime > self._mtime:
             self._mtime = file.mtime
+        for aggregator in self.aggregators:
+            aggregator.add(file)
+
+    def tally(self):
+        """ Contribute file known only by directory entry """
+        self.count += 1
+
+    def merge(self, item):
+        """ Contribute listing item of already traversed subtree """
+        self.contribute(item.file)
+        if isinstance(item, Dir):
+            self._size += item.size
+            self.count += item.count
+            if item.mtime > self._mtime:
+                self._mtime = item.mtime
+            for mine, other in zip(self.aggregators, item.aggregators):
+                mine.merge(other)
+        for mark, level in item.markers.items():
+            self.set_mark(mark, level)
+        if not item.complete:
+            self._partial = True
 
 
 class Link(Item):
     """ Symlink or door to somewhere """
 
-    def __init__(self, file):
+    def __init__(self, file, *, cache=None):
         super().__init__(file)
         self._linked_path = None
         self._linked_file = None
+        self._cache = cache  # linked path -> File, shared between links
 
     def is_symlink(self):
         return True
 
     def linked_path(self):
         if not self._linked_path:
-            self._linked_path = os.readlink(self.file.path)
+            self._linked_path = os.fsdecode(
+                self.file.backend.readlink(self.file.path))
         return self._linked_path
 
+    def target(self):
+        """ Normalized path of linked file """
+        path = self.linked_path()
+        if not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(self.path), path)
+        return os.path.normpath(path)
+
     def linked_file(self):
+        """ File of link target, FileNotFoundError if link is orphan.
+        Target is resolved once for all links sharing the cache, orphan
+        is cached as None. """
         if not self._linked_file:
-            path = self.linked_path()
-            if not os.path.isabs(path):
-                path = os.path.join(os.path.dirname(self.path), path)
-            self._linked_file = File(path)
+            path = self.target()
+            if self._cache is None:
+                self._cache = {}
+            if path not in self._cache:
+                self._cache[path] = lstat_file(path, self.file.backend)
+            self._linked_file = self._cache[path]
+            if self._linked_file is None:
+                raise FileNotFoundError(errno.ENOENT, os.strerror(
+                    errno.ENOENT), path)
         return self._linked_file
 
 
+def lstat_file(path, backend=OS):
+    """ File of path, or None if it can not be stat'ed """
+    try:
+        return File(path, backend=backend)
+    except OSError as ex:
+        D("orphan %s: %s", path, ex)
+        return None
+
+
+# links resolved concurrently before listing, when there are this many
+LINK_BATCH_MIN = 8
+LINK_WORKERS = 16
+LINK_BATCH = 64  # links resolved together while streaming
+
+
+def _link_target(link):
+    try:
+        return link.target()
+    except OSError as ex:
+        D("readlink %s: %s", link.path, ex)
+        return None
+
+
+def resolve_links(items, *, workers=LINK_WORKERS):
+    """ Read links and stat their targets concurrently, each distinct
+    target once, so formatting finds them in link caches """
+    links = [item for item in items
+             if isinstance(item, Link) and item._linked_file is None]
+    if len(links) < LINK_BATCH_MIN:
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        wanted = {}  # (cache id, path) -> (cache, path, backend)
+        for link, path in zip(links, executor.map(_link_target, links)):
+            if link._cache is None:
+                link._cache = {}
+            if path is not None and path not in link._cache:
+                wanted[id(link._cache), path] = (
+                    link._cache, path, link.file.backend)
+        wanted = list(wanted.values())
+        files = executor.map(lambda want: lstat_file(want[1], want[2]),
+                             wanted)
+        for (cache, path, _), file in zip(wanted, files):
+            cache[path] = file
+
+
 class File:
     is_mount = False
 
-    def __init__(self, path, *, stat=None):
+    def __init__(self, path, *, stat=None, backend=OS):
         self.path = path
-        self.stat = stat if stat else os.lstat(path)
+        self.backend = backend
+        self.stat = stat if stat else backend.lstat(path)
 
     def __repr__(self):
         return "File(%r)" % self.path
 
     @property
     def name(self):
-        return os.path.basename(self.path)
+        return os.fsdecode(os.path.basename(self.path))
 
     @property
     def dev(self):
@@ -469,26 +719,225 @@ def filter_nobak(name):
     return name.endswith("~")
 
 
+# many command line paths in one directory are resolved with scandir
+BATCH_MIN = 16
+
+
 class Traverse:
-    def __init__(self, *, filters=(filter_nodot,), follow=False, maxdepth=1,
-                 crossmount=False, timeout=0.5):
+    def __init__(self, *, filters=(filter_nodot,), follow=False,
+                 follow_command_line=False, maxdepth=1,
+                 crossmount=False, timeout=0.5, max_entries=0, max_dirs=0,
+                 budget_per_item=False, mounts=None, aggregators=(),
+                 backend=OS, throttle=None, needs=NEED_ALL, prune=None,
+                 history=None, adapt_timeout=False, bytes_paths=False):
         self.filters = filters  # --all, --almost-all, --ignore-backups --hide
         self.follow = follow  # -L --dereference
+        self.follow_command_line = follow or follow_command_line  # -H
+        self.linked = {}  # resolved symlink targets
+        self.aggregators = aggregators  # Aggregator classes for Dir items
+        self.shared = {}  # (dev, ino) -> listing items of traversed dir
         self.maxdepth = maxdepth
         self.crossmount = crossmount
         self.timeout = Timeout(timeout)
-        self.markers = get_markers()
+        self.timeout_default = timeout
+        self.history = history  # history.History to order and budget items
+        self.adapt_timeout = adapt_timeout  # timeout per root from history
+        if budget_per_item:
+            self.budget = Budget()
+            self.item_limits = dict(max_entries=max_entries,
+                                    max_dirs=max_dirs)
+        else:
+            self.budget = Budget(max_entries=max_entries, max_dirs=max_dirs)
+            self.item_limits = {}
+        self.backend = backend
+        self.throttle = throttle  # nice.Throttle for scandir and stat calls
+        self.prune = prune  # prune(item) -> True stops traversing item
+        # stat only directories when no sizes or times are needed
+        self.stat_all = NEED_STAT in needs or follow or bool(aggregators)
+        if backend is OS:
+            self.markers = get_markers() if NEED_MARKERS in needs else ()
+            self.mounts = mounts if mounts is not None else get_mounts()
+        else:
+            self.markers = ()
+            self.mounts = MountTable(None)
+        # read directories below listed items by bytes paths, names are
+        # decoded only for listed items
+        self.bytes_paths = bytes_paths and backend is OS
+        self.cancelled = False
+
+    def cancel(self):
+        """ Stop traversing, may be called from other thread. """
+        self.cancelled = True
+        self.timeout = Timeout(0)
 
     def __call__(self, path):
-        updir = File(path)
+        if self.history is not None:
+            yield from self._ordered(path)
+            return
+        updir = File(path, backend=self.backend)
+        if self.follow_command_line and updir.is_symlink():
+            updir = self._dereference(updir)
         try:
-            for entry in os.scandir(path):
+            for entry in self.backend.scandir(path):
                 if not self._ignore(entry.name):
                     yield from self._traverse(entry.path, depth=1, updir=updir)
         except PermissionError as ex:
             log.error("%s", str(ex))
         except NotADirectoryError as ex:
-            yield from self._traverse(path)
+            yield from self._traverse(path, stat=updir.stat)
+
+    def _ordered(self, path):
+        """ Traverse path entries cheapest first by history. When history
+        expects more work than timeout allows, each item gets deadline
+        for its share of the remaining time. """
+        updir = File(path, backend=self.backend)
+        if self.follow_command_line and updir.is_symlink():
+            updir = self._dereference(updir)
+        root = os.path.abspath(path)
+        if self.adapt_timeout:
+            self.timeout = Timeout(self.history.timeout(
+                root, self.timeout_default))
+        start = time.monotonic()
+        try:
+            entries = [entry for entry in self.backend.scandir(path)
+                       if not self._ignore(entry.name)]
+        except PermissionError as ex:
+            log.error("%s", str(ex))
+            return
+        except NotADirectoryError:
+            yield from self._traverse(path, stat=updir.stat)
+            return
+        ordered = self.history.order(
+            entries, lambda entry: os.path.abspath(entry.path))
+        left = sum(cost for _, cost in ordered)
+        complete = True
+        for entry, cost in ordered:
+            now = time.monotonic()
+            remaining = self.timeout.start_time + self.timeout.delay - now
+            deadline = 0
+            if cost and left > remaining > 0:
+                deadline = now + remaining * cost / left
+            left -= cost
+            top = None
+            for item in self._traverse(entry.path, depth=1, updir=updir,
+                                       deadline=deadline):
+                top = top or item
+                yield item
+            if top is None:
+                continue
+            # files cost nothing to list, keep history for directories
+            if isinstance(top, Dir):
+                self.history.record(os.path.abspath(entry.path), top.count,
+                                    time.monotonic() - now, top.complete)
+            complete = complete and top.complete
+        self.history.record_root(root, time.monotonic() - start, complete)
+
+    def many(self, paths):
+        """ Traverse command line paths. Many paths in same directory are
+        resolved with one scandir, duplicate paths are traversed once and
+        paths nested in other paths are traversed first, so that their
+        results are shared with the enclosing path. """
+        files = []  # (path, stat) of known non-directories
+        dirs = []
+        groups = {}
+        for path in paths:
+            parent = os.path.dirname(os.path.normpath(path))
+            groups.setdefault(parent, []).append(path)
+        for parent, group in groups.items():
+            if len(group) < BATCH_MIN:
+                dirs.extend(group)
+                continue
+            wanted = {}
+            for path in group:
+                name = os.path.basename(os.path.normpath(path))
+                wanted.setdefault(name, []).append(path)
+            try:
+                for entry in self.backend.scandir(parent or os.curdir):
+                    for path in wanted.pop(entry.name, ()):
+                        # like __call__, scandir lists linked directory
+                        if entry.is_dir():
+                            dirs.append(path)
+                        else:
+                            files.append(
+                                (path, entry.stat(follow_symlinks=False)))
+            except OSError as ex:
+                log.error("%s", str(ex))
+            for rest in wanted.values():
+                dirs.extend(rest)  # "." and "..", or missing ones
+
+        seen = set()
+        for path, st in files:
+            file = File(path, stat=st, backend=self.backend)
+            if self.follow_command_line and file.is_symlink():
+                file = self._dereference(file)
+            key = (file.dev, file.stat.st_ino)
+            if key not in seen:
+                seen.add(key)
+                yield from self._traverse(path, stat=file.stat)
+
+        resolved = {}  # real path -> (path, key)
+        for path in dirs:
+            try:
+                st = self.backend.stat(path) if self.follow_command_line \
+                    else self.backend.lstat(path)
+            except OSError as ex:
+                log.error("%s", str(ex))
+                continue
+            key = (st.st_dev, st.st_ino)
+            if key not in seen:
+                seen.add(key)
+                resolved[self.backend.realpath(path)] = path, key
+        for real in sorted(resolved, key=lambda real: real.count(os.sep),
+                           reverse=True):
+            path, key = resolved[real]
+            parent = os.path.dirname(real)
+            while parent not in resolved and parent != real:
+                real, parent = parent, os.path.dirname(parent)
+            if parent in resolved:
+                yield from self._share(path, key)
+            else:
+                yield from self(path)
+
+    def _share(self, path, key):
+        """ Traverse path like __call__, and keep also ignored items for
+        enclosing path traverse """
+        updir = File(path, backend=self.backend)
+        if self.follow_command_line and updir.is_symlink():
+            updir = self._dereference(updir)
+        items = []
+        try:
+            for entry in self.backend.scandir(path):
+                listed = not self._ignore(entry.name)
+                for item in self._traverse(entry.path, depth=1,
+                                           updir=updir):
+                    if item.depth == 1:
+                        items.append(item)
+                    if listed:
+                        yield item
+        except PermissionError as ex:
+            log.error("%s", str(ex))
+            return
+        except NotADirectoryError:
+            yield from self._traverse(path, stat=updir.stat)
+            return
+        self.shared[key] = items
+
+    def _dereference(self, file):
+        """ File of symlink target under symlink path, or the symlink
+        itself if link is broken """
+        try:
+            return File(file.path, stat=self.backend.stat(file.path),
+                        backend=self.backend)
+        except OSError as ex:
+            D("broken link %s: %s", file.path, ex)
+            return file
+
+    def _lstat(self, path):
+        """ lstat through mount policy when path is network mount point """
+        guard = self.mounts.guard(path)
+        if guard is not None:
+            return guard.lstat(path, self.backend)
+        return self.backend.lstat(path)
 
     def _ignore(self, name):
         for filter in self.filters:
@@ -496,56 +945,128 @@ class Traverse:
                 return True
         return False
 
-    def _traverse(self, path, *, stat=None, updir=None, depth=0, item=None):
+    def _traverse(self, path, *, stat=None, updir=None, depth=0, item=None,
+                  budget=None, deadline=0):
         """ Traverse path and yield listing items. Note: yielded listing item
         is not complete until this call is fully done. """
 
         D("%d %s", depth, path)
 
-        # reduce filters
-
-        #
-        file = File(path, stat=stat)
+        if stat is None:
+            try:
+                stat = self._lstat(path)
+            except MountTimeoutError as ex:
+                log.error("%s", str(ex))
+                if item is not None:
+                    item._partial = True
+                return
+        file = File(path, stat=stat, backend=self.backend)
+        seen = False
+        if self.follow:
+            if file.is_symlink():
+                file = self._dereference(file)
+            # visited directories and hard linked files of item guard
+            # against cycles and count targets of many links only once.
+            # Files with one link can be reached only once.
+            key = (file.dev, file.stat.st_ino)
+            if depth > self.maxdepth and (
+                    file.is_dir() or file.stat.st_nlink > 1):
+                seen = key in item.visited
+                item.visited.add(key)
 
         # create listing item or contribute sub files to item
         if depth <= self.maxdepth:
             if file.is_dir():
                 item = Dir(file)
+                if self.aggregators:
+                    item.aggregators = [cls() for cls in self.aggregators]
             elif file.is_symlink():
-                item = Link(file)
+                item = Link(file, cache=self.linked)
             else:
                 item = Regular(file)
             item.depth = depth
+            if self.follow:
+                item.visited = {key}
+            # each listed item accounts its own work, limited per item or
+            # by the shared traverse budget
+            budget = item.budget = Budget(parent=self.budget,
+                                          deadline=deadline,
+                                          **self.item_limits)
             yield item  # yield item now and update it along traversing
+        elif seen:
+            return
         else:
             item and item.contribute(file)
+        budget.spend(entries=1)
 
         # don't cross fs mounts and mark is_mount for file
         if updir is not None and file.dev != updir.dev:
             file.is_mount = True
+            if depth <= self.maxdepth:
+                item.mount = self.mounts.find(file)
             if not self.crossmount:
                 return
 
         # traverse recursively
         if file.is_dir():
+            policy = self.mounts.policy(file.dev)
+            if policy.skip:
+                return
             for marker in self.markers:
                 item.set_mark(*marker(file))
+            if self.prune is not None and self.prune(item):
+                budget.stop()
+                return
+            if self.shared:
+                shared = self.shared.get((file.dev, file.stat.st_ino))
+                if shared is not None:
+                    for child in shared:
+                        item.merge(child)
+                    if depth == item.depth:
+                        item.complete = not item._partial
+                    return
             try:
-                for entry in os.scandir(file.path):
-                    # cancel traversing if timeout
-                    if self.timeout:
-                        D("%s depth=%d item=%r entry=%r", self.timeout, depth,
-                          item, entry)
+                budget.spend(dirs=1)
+                throttle = self.throttle
+                if throttle is not None:
+                    throttle.take(self.timeout, budget)
+                path = file.path
+                if self.bytes_paths:
+                    path = os.fsencode(path)
+                for entry in policy.scandir(path, self.backend):
+                    # cancel traversing if timeout or work budget is spent
+                    if self.timeout or budget:
+                        D("%s %s depth=%d item=%r entry=%r", self.timeout,
+                          budget, depth, item, entry)
+                        item._partial = True
                         return
+                    if throttle is not None:
+                        throttle.take(self.timeout, budget)
+                    if not self.stat_all and depth >= self.maxdepth and \
+                            not entry.is_dir(follow_symlinks=False):
+                        item.tally()
+                        budget.spend(entries=1)
+                        continue
+                    # stat of network mount point is guarded in _traverse
+                    guarded = self.mounts.guarded and entry.is_dir(
+                        follow_symlinks=False) and self.mounts.guard(
+                            entry.path)
                     yield from self._traverse(
-                        os.path.join(file.path, entry.name),
-                        stat=entry.stat(follow_symlinks=False),
+                        entry.path,
+                        stat=None if guarded else entry.stat(
+                            follow_symlinks=False),
                         updir=file,
                         depth=depth + 1,
-                        item=item)
+                        item=item,
+                        budget=budget)
                 if item and depth == item.depth:
-                    item.complete = True
+                    item.complete = not item._partial
             except NotADirectoryError as ex:
                 log.error("%s", str(ex))
             except PermissionError as ex:
                 log.error("%s", str(ex))
+            except MountTimeoutError as ex:
+                log.error("%s", str(ex))
+
+
+from .aio import scan, Scan, Snapshot, Done  # noqa: E402,F401
@@ -0,0 +1,165 @@
+"""
+Pluggable aggregators fed from the same stats as directory totals.
+
+Aggregator sums file sizes by a key. Traverse gives each listed
+directory own instances, and Dir.contribute feeds them every file below
+the directory.
+"""
+
+import os
+import stat
+import sys
+import time
+
+from colorama import Style
+from humanize import naturalsize
+
+from .util import user_name, group_name
+
+
+class Aggregator:
+    """ Sum of bytes by key, subclass defines key(file) """
+
+    name = ""
+    title = ""
+
+    def __init__(self):
+        self.totals = {}
+
+    def key(self, file):
+        raise NotImplementedError(self.__class__.__name__ + ".key")
+
+    def label(self, key):
+        return str(key)
+
+    def add(self, file):
+        key = self.key(file)
+        self.totals[key] = self.totals.get(key, 0) + file.stat.st_size
+
+    def merge(self, other):
+        for key, size in other.totals.items():
+            self.totals[key] = self.totals.get(key, 0) + size
+
+    def top(self):
+        """ -> (label, share) of largest key or None """
+        if not self.totals:
+            return None
+        key = max(self.totals, key=self.totals.get)
+        total = sum(self.totals.values())
+        return self.label(key), self.totals[key] / total if total else 1.0
+
+
+class ByOwner(Aggregator):
+    name = "owner"
+    title = "bytes by owner"
+
+    def key(self, file):
+        return file.stat.st_uid
+
+    def label(self, key):
+        return user_name(key)
+
+
+class ByGroup(Aggregator):
+    name = "group"
+    title = "bytes by group"
+
+    def key(self, file):
+        return file.stat.st_gid
+
+    def label(self, key):
+        return group_name(key)
+
+
+class ByExtension(Aggregator):
+    name = "ext"
+    title = "bytes by extension"
+
+    def add(self, file):
+        if stat.S_ISREG(file.stat.st_mode):
+            super().add(file)
+
+    def key(self, file):
+        return os.path.splitext(file.name)[1].lower()
+
+    def label(self, key):
+        return key or "(none)"
+
+
+# upper limits in seconds, oldest bucket is unlimited
+AGE_BUCKETS = (
+    (24 * 3600, "<1d"),
+    (7 * 24 * 3600, "<1w"),
+    (30 * 24 * 3600, "<1M"),
+    (365 * 24 * 3600, "<1Y"),
+    (None, ">1Y"),
+)
+
+
+class ByAge(Aggregator):
+    """ Sum of bytes by age bucket of stat time attribute """
+
+    attr = "st_mtime"
+
+    def __init__(self, *, now=None):
+        super().__init__()
+        self.now = now if now is not None else time.time()
+
+    def key(self, file):
+        age = self.now - getattr(file.stat, self.attr)
+        for index, (limit, _) in enumerate(AGE_BUCKETS):
+            if limit is None or age < limit:
+                return index
+
+    def label(self, key):
+        return AGE_BUCKETS[key][1]
+
+
+class ByModifyAge(ByAge):
+    name = "mtime-age"
+    title = "bytes by modification age"
+
+
+class ByAccessAge(ByAge):
+    name = "atime-age"
+    title = "bytes by access age"
+    attr = "st_atime"
+
+
+AGGREGATORS = {cls.name: cls for cls in (
+    ByOwner, ByGroup, ByExtension, ByModifyAge, ByAccessAge)}
+
+
+def fmt_aggregate(index):
+    """ Listing column format function for index'th aggregator of item """
+
+    def fmt(item):
+        if index >= len(item.aggregators):
+            return "", Style.NORMAL
+        top = item.aggregators[index].top()
+        if top is None:
+            return "", Style.NORMAL
+        return "%s:%d%%" % (top[0], top[1] * 100), Style.NORMAL
+
+    return fmt
+
+
+def print_sections(items, aggregators, stream=None):
+    """ Write totals of aggregators merged over items, one section for
+    each aggregator class. Items without aggregators, files, are added
+    by themselves, so that sections sum up to the listing total. """
+    stream = stream or sys.stdout
+    merged = [cls() for cls in aggregators]
+    for item in items:
+        if item.aggregators:
+            for mine, other in zip(merged, item.aggregators):
+                mine.merge(other)
+        else:
+            for aggregator in merged:
+                aggregator.add(item.file)
+    for aggregator in merged:
+        stream.write("\n%s:\n" % aggregator.title)
+        for key, size in sorted(aggregator.totals.items(),
+                                key=lambda kv: kv[1], reverse=True):
+            stream.write("%10s %s\n" % (naturalsize(size, gnu=True),
+                                        aggregator.label(key)))
@@ -0,0 +1,148 @@
+"""
+asyncio interface to traverse, for embedding lss into event loop services.
+"""
+
+import asyncio
+import logging
+
+from . import Traverse
+
+log = logging.getLogger(__name__)
+D = log.debug
+
+
+class Snapshot:
+    """ Copy of listing item state, safe to use outside traverse thread """
+
+    def __init__(self, root, item):
+        self.root = root
+        self.item = item
+        self.name = item.name
+        self.path = item.path
+        self.depth = item.depth
+        self.mode = item.mode
+        self.size = item.size
+        self.count = item.count
+        self.mtime = item.mtime
+        self.complete = item.complete
+        self.markers = dict(item.markers)
+
+    def __repr__(self):
+        return "%s(%r, complete=%s, size=%d, count=%d)" % (
+            self.__class__.__name__, self.path, self.complete, self.size,
+            self.count)
+
+
+class Done:
+    """ Root traverse is finished, error is set if it failed """
+
+    def __init__(self, root, *, count=0, error=None, cancelled=False):
+        self.root = root
+        self.count = count  # number of listing items
+        self.error = error
+        self.cancelled = cancelled
+
+    def __repr__(self):
+        return "%s(%r, count=%d, error=%r, cancelled=%s)" % (
+            self.__class__.__name__, self.root, self.count, self.error,
+            self.cancelled)
+
+
+class Scan:
+    """ Async iterator over Snapshot and Done events of scanned roots.
+
+    Each root is traversed in executor thread with own Traverse, so roots
+    run concurrently and never block the event loop. Snapshot is emitted
+    once for each listing item when the item is final. """
+
+    def __init__(self, paths, *, executor=None, loop=None, **kwds):
+        self.paths = list(paths)
+        self.executor = executor
+        self.loop = loop
+        self.kwds = kwds  # Traverse arguments: timeout, max_entries, ...
+        self.traverses = []
+        self.queue = None
+        self.futures = []
+        self.pending = 0
+        self.cancelled = False
+
+    def _start(self):
+        self.loop = self.loop or asyncio.get_event_loop()
+        self.queue = asyncio.Queue()
+        for path in self.paths:
+            self.futures.append(self.loop.run_in_executor(
+                self.executor, self._run, path))
+        self.pending = len(self.paths)
+
+    def _emit(self, event):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    def _run(self, path):
+        """ Run in executor thread. Traverse and its timeout start here,
+        not while the job waits for a free executor. """
+        count = 0
+        last = None
+        try:
+            traverse = Traverse(**self.kwds)
+            self.traverses.append(traverse)
+            if self.cancelled:
+                traverse.cancel()
+            for item in traverse(path):
+                if last is not None:
+                    self._emit(Snapshot(path, last))
+                last = item
+                count += 1
+            if last is not None:
+                self._emit(Snapshot(path, last))
+            self._emit(Done(path, count=count,
+                            cancelled=traverse.cancelled))
+        except Exception as ex:
+            log.error("%s: %s", path, ex)
+            self._emit(Done(path, count=count, error=ex))
+
+    def cancel(self):
+        """ Stop all traverses as soon as possible """
+        self.cancelled = True
+        for traverse in list(self.traverses):
+            traverse.cancel()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.queue is None:
+            self._start()
+        if not self.pending:
+            raise StopAsyncIteration
+        try:
+            event = await self.queue.get()
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        if isinstance(event, Done):
+            self.pending -= 1
+        return event
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.cancel()
+        if self.futures:
+            await asyncio.wait(self.futures)
+
+
+def scan(paths, **kwds):
+    """ Scan paths without blocking event loop.
+
+    Usage::
+
+        async with lss.scan(["/data", "/home"], timeout=5) as events:
+            async for event in events:
+                ...
+
+    Keyword arguments are given to Traverse, executor and loop to the
+    event loop. """
+    if isinstance(paths, str):
+        paths = [paths]
+    return Scan(paths, **kwds)
@@ -0,0 +1,239 @@
+"""
+Filesystem backends for Traverse and File.
+
+OS backend calls os functions directly. Memory backend keeps a tree of
+stats in memory, for deterministic tests and benchmarks, and is loaded
+from zip central directory or tar headers to list archives without
+extracting them.
+"""
+
+import errno
+import logging
+import os
+import stat
+import tarfile
+import time
+import zipfile
+
+log = logging.getLogger(__name__)
+D = log.debug
+
+
+class OSBackend:
+    """ Operating system filesystem """
+
+    scandir = staticmethod(os.scandir)
+    lstat = staticmethod(os.lstat)
+    stat = staticmethod(os.stat)
+    readlink = staticmethod(os.readlink)
+    realpath = staticmethod(os.path.realpath)
+
+
+OS = OSBackend()
+
+
+def _error(code, path):
+    exc = {
+        errno.ENOENT: FileNotFoundError,
+        errno.ENOTDIR: NotADirectoryError,
+    }.get(code, OSError)
+    return exc(code, os.strerror(code), path)
+
+
+class Node:
+    def __init__(self, st, *, target=None):
+        self.stat = st
+        self.target = target  # symlink target
+        self.children = {} if stat.S_ISDIR(st.st_mode) else None
+
+
+class MemoryEntry:
+    """ os.DirEntry like entry of memory backend """
+
+    def __init__(self, backend, path, name, node):
+        self.backend = backend
+        self.path = path
+        self.name = name
+        self.node = node
+
+    def __repr__(self):
+        return "<MemoryEntry %r>" % self.name
+
+    def inode(self):
+        return self.node.stat.st_ino
+
+    def stat(self, *, follow_symlinks=True):
+        if follow_symlinks and self.node.target is not None:
+            return self.backend.stat(self.path)
+        return self.node.stat
+
+    def is_dir(self, *, follow_symlinks=True):
+        try:
+            return stat.S_ISDIR(self.stat(follow_symlinks=follow_symlinks)
+                                .st_mode)
+        except OSError:
+            return False
+
+    def is_file(self, *, follow_symlinks=True):
+        try:
+            return stat.S_ISREG(self.stat(follow_symlinks=follow_symlinks)
+                                .st_mode)
+        except OSError:
+            return False
+
+    def is_symlink(self):
+        return self.node.target is not None
+
+
+class MemoryBackend:
+    """ Filesystem tree in memory. Paths are relative to the tree root
+    ".", and separated by "/". """
+
+    def __init__(self, *, dev=0, mtime=0.0, uid=0, gid=0):
+        self.dev = dev
+        self.ino = 0
+        self.uid = uid
+        self.gid = gid
+        self.root = Node(self._stat(stat.S_IFDIR | 0o755, 0, mtime))
+
+    def _stat(self, mode, size, mtime, uid=None, gid=None, ino=None):
+        if ino is None:
+            self.ino += 1
+            ino = self.ino
+        return os.stat_result((
+            mode, ino, self.dev, 1,
+            self.uid if uid is None else uid,
+            self.gid if gid is None else gid,
+            size, mtime, mtime, mtime))
+
+    def _parts(self, path):
+        path = os.path.normpath(path).lstrip("/")
+        return [] if path == "." else path.split("/")
+
+    def _node(self, path):
+        node = self.root
+        for part in self._parts(path):
+            if node.children is None or part not in node.children:
+                raise _error(errno.ENOENT, path)
+            node = node.children[part]
+        return node
+
+    def add(self, path, *, size=0, mode=stat.S_IFREG | 0o644, mtime=0.0,
+            uid=None, gid=None, target=None, link=None):
+        """ Add file, directory or symlink with its missing parents. Hard
+        link to existing path is given as link. """
+        parts = self._parts(path)
+        if not parts:
+            return self.root  # archive entry for root itself
+        node = self.root
+        for part in parts[:-1]:
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = Node(
+                    self._stat(stat.S_IFDIR | 0o755, 0, mtime))
+            node = child
+        if target is not None:
+            mode = stat.S_IFLNK | 0o777
+            size = len(target)
+        ino = self._node(link).stat.st_ino if link is not None else None
+        st = self._stat(mode, size, mtime, uid, gid, ino)
+        old = node.children.get(parts[-1])
+        if old is not None and old.children is not None and \
+                stat.S_ISDIR(mode):
+            old.stat = st  # implicit parent directory gets real stat
+            return old
+        new = node.children[parts[-1]] = Node(st, target=target)
+        return new
+
+    def lstat(self, path):
+        return self._node(path).stat
+
+    def stat(self, path):
+        for _ in range(40):
+            node = self._node(path)
+            if node.target is None:
+                return node.stat
+            path = os.path.join(os.path.dirname(path), node.target)
+        raise _error(errno.ELOOP, path)
+
+    def readlink(self, path):
+        node = self._node(path)
+        if node.target is None:
+            raise _error(errno.EINVAL, path)
+        return node.target
+
+    def realpath(self, path):
+        return os.path.normpath(path)
+
+    def scandir(self, path):
+        node = self._node(path)
+        if node.children is None:
+            raise _error(errno.ENOTDIR, path)
+        return [MemoryEntry(self, os.path.join(path, name), name, child)
+                for name, child in sorted(node.children.items())]
+
+
+def open_zip(path):
+    """ Memory backend from zip central directory """
+    backend = MemoryBackend(mtime=os.stat(path).st_mtime)
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            mode = info.external_attr >> 16
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            if info.filename.endswith("/"):
+                backend.add(info.filename.rstrip("/"), mtime=mtime,
+                            mode=stat.S_IFDIR | (stat.S_IMODE(mode) or 0o755))
+            elif stat.S_ISLNK(mode):
+                # link target is the only file data read
+                backend.add(info.filename, mtime=mtime,
+                            target=archive.read(info).decode())
+            else:
+                backend.add(info.filename, size=info.file_size, mtime=mtime,
+                            mode=stat.S_IFREG | (stat.S_IMODE(mode) or 0o644))
+    return backend
+
+
+def open_tar(path):
+    """ Memory backend from tar headers, data blocks of uncompressed
+    archive are skipped by seek """
+    backend = MemoryBackend(mtime=os.stat(path).st_mtime)
+    with tarfile.open(path) as archive:
+        for member in archive:
+            name = member.name
+            kwds = dict(mtime=member.mtime, uid=member.uid, gid=member.gid)
+            if member.isdir():
+                backend.add(name, mode=stat.S_IFDIR | member.mode, **kwds)
+            elif member.issym():
+                backend.add(name, target=member.linkname, **kwds)
+            elif member.islnk():
+                try:
+                    target = backend.lstat(member.linkname)
+                except OSError:
+                    # target member is missing, keep link as empty file
+                    D("%s: missing hard link target %s", name,
+                      member.linkname)
+                    backend.add(name, mode=stat.S_IFREG | member.mode,
+                                **kwds)
+                    continue
+                backend.add(name, size=target.st_size, mode=target.st_mode,
+                            link=member.linkname, **kwds)
+            else:
+                mode = stat.S_IFREG
+                if member.ischr():
+                    mode = stat.S_IFCHR
+                elif member.isblk():
+                    mode = stat.S_IFBLK
+                elif member.isfifo():
+                    mode = stat.S_IFIFO
+                backend.add(name, size=member.size, mode=mode | member.mode,
+                            **kwds)
+    return backend
+
+
+def open_archive(path):
+    """ Memory backend of zip or tar archive """
+    if zipfile.is_zipfile(path):
+        return open_zip(path)
+    if tarfile.is_tarfile(path):
+        return open_tar(path)
+    raise ValueError("%s: not a zip or tar archive" % path)
@@ -0,0 +1,311 @@
+"""
+Interactive drill-down browser, like ncdu.
+
+One background traverse builds a tree of directory totals. Moving in and
+out of directories and re-sorting uses the tree, nothing is rescanned.
+Incomplete directories are refined in the background when they are
+browsed into, each refine replaces the subtree and fixes the totals of
+its parents.
+"""
+
+import curses
+import logging
+import os
+import queue
+import threading
+
+from humanize import naturalsize
+
+from . import Traverse, Dir, NEED_STAT
+
+log = logging.getLogger(__name__)
+D = log.debug
+
+MAXDEPTH = 1 << 16  # list every entry of tree as an item
+SCAN_TIMEOUT = 30.0  # first scan, incomplete parts are refined later
+REFINE_TIMEOUT = 5.0
+SORT_KEYS = {
+    # key: (sort function, reverse)
+    "size": (lambda node: node.size, True),
+    "count": (lambda node: node.count, True),
+    "mtime": (lambda node: node.mtime, True),
+    "name": (lambda node: node.name, False),
+}
+
+
+class Node:
+    """ Tree entry. size and count of directory are totals below it, own
+    is size of the entry itself. """
+
+    __slots__ = ("name", "parent", "children", "own", "size", "count",
+                 "mtime", "complete")
+
+    def __init__(self, name, *, parent=None, is_dir=False, own=0, mtime=0,
+                 complete=True):
+        self.name = name
+        self.parent = parent
+        self.children = [] if is_dir else None
+        self.own = own
+        self.size = 0 if is_dir else own
+        self.count = 0
+        self.mtime = mtime
+        self.complete = complete
+
+    def __repr__(self):
+        return "Node(%r, size=%d, count=%d, complete=%s)" % (
+            self.name, self.size, self.count, self.complete)
+
+    @property
+    def is_dir(self):
+        return self.children is not None
+
+    @property
+    def path(self):
+        names = []
+        node = self
+        while node is not None:
+            names.append(node.name)
+            node = node.parent
+        return os.path.join(*reversed(names))
+
+    def weight(self):
+        """ -> (size, count) this node adds to its parents """
+        if self.is_dir:
+            return self.own + self.size, 1 + self.count
+        return self.own, 1
+
+
+class Tree:
+    """ Totals tree of path, built and refined in background thread.
+    Keyword arguments are given to Traverse. """
+
+    def __init__(self, path, *, refine_timeout=REFINE_TIMEOUT, **kwds):
+        self.kwds = kwds
+        self.refine_timeout = refine_timeout
+        self.lock = threading.Lock()
+        self.root = Node(path, is_dir=True, complete=False)
+        self.jobs = queue.Queue()
+        self.tried = set()  # nodes wanted for refine, under lock
+        self.traverse = None
+        self.scanning = False
+        self.thread = None
+
+    def start(self):
+        self.scanning = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.jobs.put(None)
+        if self.traverse is not None:
+            self.traverse.cancel()
+
+    def _run(self):
+        self.build(self.root, self.root.name, **self.kwds)
+        self.scanning = False
+        while True:
+            node = self.jobs.get()
+            if node is None:
+                return
+            self.refine(node)
+
+    def build(self, root, path, **kwds):
+        """ Traverse path into root """
+        kwds.setdefault("maxdepth", MAXDEPTH)
+        kwds.setdefault("needs", frozenset((NEED_STAT,)))  # no markers
+        self.traverse = traverse = Traverse(**kwds)
+        stack = [root]
+        dirs = []  # (node, item) to take complete from when done
+        for item in traverse(path):
+            parent = stack[item.depth - 1]
+            is_dir = isinstance(item, Dir)
+            node = Node(item.name, parent=parent, is_dir=is_dir,
+                        own=item.stat.st_size, mtime=item.mtime,
+                        complete=not is_dir)
+            with self.lock:
+                parent.children.append(node)
+                self._add(parent, *node.weight(), mtime=node.mtime)
+            del stack[item.depth:]
+            if is_dir:
+                stack.append(node)
+                dirs.append((node, item))
+        for node, item in dirs:
+            node.complete = item.complete
+        root.complete = all(child.complete for child in root.children)
+        self.traverse = None
+
+    def _add(self, node, size, count, *, mtime=0):
+        while node is not None:
+            node.size += size
+            node.count += count
+            if mtime > node.mtime:
+                node.mtime = mtime
+            node = node.parent
+
+    def attached(self, node):
+        """ Is node still in tree, not replaced by refine """
+        while node.parent is not None:
+            if not any(child is node for child in node.parent.children):
+                return False
+            node = node.parent
+        return node is self.root
+
+    def lookup(self, node):
+        """ Node at path of node in current tree, or nearest parent """
+        names = []
+        while node.parent is not None:
+            names.append(node.name)
+            node = node.parent
+        found = self.root
+        with self.lock:
+            for name in reversed(names):
+                for child in found.children:
+                    if child.name == name and child.is_dir:
+                        found = child
+                        break
+                else:
+                    break
+        return found
+
+    def want(self, node):
+        """ Refine node in background if it is incomplete """
+        with self.lock:
+            if not node.is_dir or node.complete or node in self.tried:
+                return
+            self.tried.add(node)
+        self.jobs.put(node)
+
+    def refine(self, node):
+        """ Traverse node again with refine timeout, and replace it when
+        more was found. Incomplete children are wanted when node is still
+        incomplete. """
+        if node.complete or not self.attached(node):
+            return
+        D("refine %s", node.path)
+        fresh = Node(node.name, is_dir=True, own=node.own, mtime=node.mtime)
+        kwds = dict(self.kwds, timeout=self.refine_timeout)
+        self.build(fresh, node.path, **kwds)
+        with self.lock:
+            if not self.attached(node) or fresh.count < node.count:
+                return
+            if node.parent is None:
+                self.root = fresh
+            else:
+                siblings = node.parent.children
+                siblings[siblings.index(node)] = fresh
+                fresh.parent = node.parent
+                self._add(node.parent, fresh.size - node.size,
+                          fresh.count - node.count, mtime=fresh.mtime)
+        if not fresh.complete:
+            for child in fresh.children:
+                self.want(child)
+
+    def children(self, node, key="size", reverse=False):
+        """ Sorted copy of children of node """
+        func, descending = SORT_KEYS[key]
+        with self.lock:
+            children = list(node.children)
+        children.sort(key=func, reverse=descending != reverse)
+        return children
+
+
+def fmt_node(node, width, parent_size):
+    bar = ""
+    if parent_size:
+        fill = int(10 * node.size / parent_size + 0.5)
+        bar = "[%-10s]" % ("#" * fill)
+    name = node.name + ("/" if node.is_dir else "")
+    line = "%9s %s %8d%s %s" % (
+        naturalsize(node.size, gnu=True), bar, node.count,
+        " " if node.complete else "+", name)
+    return line[:width - 1]
+
+
+HELP = "q quit  enter/l in  h/backspace out  s size  c count  t time  " \
+    "n name  r reverse"
+
+
+class Browser:
+    """ curses screen over tree """
+
+    def __init__(self, tree, screen):
+        self.tree = tree
+        self.screen = screen
+        self.node = tree.root
+        self.key = "size"
+        self.reverse = False
+        self.cursor = 0
+        self.top = 0
+        self.trail = []  # cursor positions of parent directories
+
+    def draw(self):
+        screen = self.screen
+        height, width = screen.getmaxyx()
+        rows = max(1, height - 3)
+        children = self.tree.children(self.node, self.key, self.reverse)
+        self.cursor = max(0, min(self.cursor, len(children) - 1))
+        if self.cursor < self.top:
+            self.top = self.cursor
+        elif self.cursor >= self.top + rows:
+            self.top = self.cursor - rows + 1
+        screen.erase()
+        status = " %s %s  %s" % (
+            self.node.path, naturalsize(self.node.size, gnu=True),
+            "scanning..." if self.tree.scanning else
+            ("" if self.node.complete else "incomplete"))
+        screen.addstr(0, 0, status[:width - 1], curses.A_REVERSE)
+        for row, child in enumerate(children[self.top:self.top + rows]):
+            attr = curses.A_REVERSE if self.top + row == self.cursor else 0
+            screen.addstr(row + 1, 0,
+                          fmt_node(child, width, self.node.size), attr)
+        screen.addstr(height - 1, 0, HELP[:width - 1])
+        screen.refresh()
+        return children
+
+    def run(self):
+        curses.curs_set(0)
+        self.screen.timeout(250)  # redraw while scanning
+        while True:
+            self.tree.want(self.node)
+            children = self.draw()
+            ch = self.screen.getch()
+            if ch in (ord("q"), 27):
+                return
+            elif ch in (curses.KEY_DOWN, ord("j")):
+                self.cursor += 1
+            elif ch in (curses.KEY_UP, ord("k")):
+                self.cursor -= 1
+            elif ch in (curses.KEY_NPAGE, ord(" ")):
+                self.cursor += self.screen.getmaxyx()[0] - 3
+            elif ch == curses.KEY_PPAGE:
+                self.cursor -= self.screen.getmaxyx()[0] - 3
+            elif ch in (curses.KEY_RIGHT, curses.KEY_ENTER, ord("\n"),
+                        ord("l")):
+                if children and children[self.cursor].is_dir:
+                    self.trail.append((self.node, self.cursor, self.top))
+                    self.node = children[self.cursor]
+                    self.cursor = self.top = 0
+            elif ch in (curses.KEY_LEFT, curses.KEY_BACKSPACE, 127,
+                        ord("h")):
+                if self.trail:
+                    self.node, self.cursor, self.top = self.trail.pop()
+            elif ch in (ord("s"), ord("c"), ord("t"), ord("n")):
+                self.key = {"s": "size", "c": "count", "t": "mtime",
+                            "n": "name"}[chr(ch)]
+            elif ch == ord("r"):
+                self.reverse = not self.reverse
+            if not self.tree.attached(self.node):
+                # refine replaced node or its parent
+                self.node = self.tree.lookup(self.node)
+                self.trail = [(self.tree.lookup(node), cursor, top)
+                              for node, cursor, top in self.trail]
+
+
+def browse(path, **kwds):
+    """ Browse path interactively, keyword arguments are given to Tree """
+    tree = Tree(path, **kwds)
+    tree.start()
+    try:
+        curses.wrapper(lambda screen: Browser(tree, screen).run())
+    finally:
+        tree.stop()
@@ -1,9 +1,23 @@
 import argparse
 import logging
 import sys
+import tarfile
+import zipfile
 
 from . import __version__
-from . import filter_all, filter_nobak, filter_nodot, Traverse, Listing
+from . import filter_all, filter_nobak, filter_nodot, Traverse, Listing, Link
+from . import FIELDS
+from . import snapshot
+from .mounts import MountTable
+from .aggregate import AGGREGATORS, print_sections
+from . import dupes
+from .backend import OS, open_archive
+from . import nice
+from .history import History
+from .query import Query, parse_size
+from .extsort import SpillingListing
+from . import browse
+from .index import Index, top
 
 log = logging.getLogger(__name__)
 D = log.debug
@@ -19,6 +33,9 @@ class TBD:
 
 TBD = TBD()
 
+DEFAULT_TIMEOUT = 0.5
+DEFAULT_DIFF_TOP = 20
+
 ARGS = argparse.ArgumentParser(
     formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     allow_abbrev=True,  # because enabling -atB style
@@ -37,12 +54,22 @@ ARGS.add_argument("--debug", action="store_true",
 GRP = ARGS.add_argument_group("Fields")
 GRP.add_argument("-i", "--inode", action="store_true",
                  help="print the index number of each file")
+GRP.add_argument("--by", metavar="KEY", action="append", default=[],
+                 choices=sorted(AGGREGATORS),
+                 help="""sum directory tree bytes also by KEY, shows the
+                 largest KEY of each directory and a summary section.
+                 KEY is one of %(choices)s, may be given many times""")
+GRP.add_argument("--fields", metavar="LIST",
+                 help="""comma separated fields to show in order, from %s.
+                 Traverse skips work no shown field needs, eg. --fields
+                 count,name does not stat files""" % ",".join(FIELDS))
+GRP.add_argument("-G", "--no-group", action="store_true",
+                 help="do not print group names")
 # TODO -c                         with -lt: sort by, and show, ctime (time of
 # last
 #                               modification of file status information);
 #                               with -l: show ctime and sort by name;
 #                               otherwise: sort by ctime, newest first
-# TODO -G, --no-group             in a long listing, don't print group names
 # TODO -o                         like -l, but do not list group information
 # -u                         with -lt: sort by, and show, access time;
 #                               with -l: show access time and sort by name;
@@ -65,8 +92,8 @@ GRP.add_argument("-g", "--group-directories-first", action="store_true",
 GRP.add_argument("-L", "--dereference", action="store_true",
                  help="""when showing file information for a symbolic
       link, show information for the file the link
-      references rather than for the link itself TBD""")
-# TODO: -L symlink dereference
+      references rather than for the link itself, and follow
+      symbolic links in traversing""")
 GRP.add_argument("-d", "--directory", action="store_true",
                  help="list directories themselves, not their contents TBD")
 # TODO: -d flag
@@ -76,6 +103,10 @@ GRP.add_argument("-t", "--sort-time", action="store_true",
                  help="sort by modification time, newest first")
 GRP.add_argument("-S", "--sort-size", action="store_true",
                  help="sort by file size, largest first")
+GRP.add_argument("--max-memory", metavar="SIZE",
+                 help="""keep at most about SIZE (e.g. 512M) of formatted
+      rows in memory, and sort the rest in temporary files, for
+      directories with millions of entries""")
 TBD.add_argument("-X", "--sort-ext", action="store_true",
                  help="TBD sort alphabetically by entry extension")
 # TODO: sort alphabetically by entry extension
@@ -94,17 +125,87 @@ TBD.add_argument("-X", "--sort-ext", action="store_true",
 # TODO -U                       do not sort; list entries in directory order
 
 GRP = ARGS.add_argument_group("Traverse")
-GRP.add_argument("-T", "--timeout", default=0.5, metavar="SECS", type=float,
-                 help="""timeout to stop traversing on large trees.
-                 To scan all files give a 'big' timeout eg. -T 99""")
+GRP.add_argument("-T", "--timeout", metavar="SECS", type=float,
+                 help="""timeout to stop traversing on large trees, default
+                 %.1f or adapted from --history. To scan all files give a
+                 'big' timeout eg. -T 99""" % DEFAULT_TIMEOUT)
+GRP.add_argument("--history", action="store_true",
+                 help="""keep history of scan times, and traverse cheap
+                 items first and expensive items with their share of
+                 timeout""")
+GRP.add_argument("--history-file", metavar="FILE",
+                 help="history file, default ~/.cache/lss/history.json")
+GRP.add_argument("--max-entries", default=0, metavar="N", type=int,
+                 help="""stop traversing after N entries, 0 is unlimited.
+                 Unlike timeout gives the same result on every run""")
+GRP.add_argument("--max-dirs", default=0, metavar="N", type=int,
+                 help="stop traversing after N directories, 0 is unlimited")
+GRP.add_argument("--budget-per-item", action="store_true",
+                 help="""apply --max-entries and --max-dirs to each listed
+                 item instead of the whole run""")
 GRP.add_argument("-H", "--dereference-command-line", action="store_true",
-                 help="follow symbolic links listed on the command line TBD")
-# TODO: -H dereference command line
+                 help="follow symbolic links listed on the command line")
+GRP.add_argument("--nice", action="store_true",
+                 help="""low impact traversing: lowest CPU and idle I/O
+                 priority, limited directory read and stat rate, and pause
+                 while system is busy""")
+GRP.add_argument("--rate", default=1000.0, metavar="OPS", type=float,
+                 help="directory reads and stats per second with --nice")
+GRP.add_argument("--max-pressure", default=10.0, metavar="PCT", type=float,
+                 help="""pause with --nice while I/O pressure (PSI some
+                 avg10) is over PCT, 0 disables""")
+GRP.add_argument("--max-load", default=1.0, metavar="LOAD", type=float,
+                 help="""pause with --nice while load average per CPU is
+                 over LOAD, 0 disables""")
+GRP.add_argument("--archive", metavar="FILE",
+                 help="""list paths inside zip or tar archive FILE without
+                 extracting it""")
 GRP.add_argument("--cross-mount", action="store_true",
                  help="cross filesystem mount points")
+GRP.add_argument("--mount-timeout", default=2.0, metavar="SECS", type=float,
+                 help="""timeout for reading one directory on network and
+                 FUSE filesystems""")
+GRP.add_argument("--mount-concurrency", default=2, metavar="N", type=int,
+                 help="""concurrent directory reads on one network or FUSE
+                 filesystem""")
+GRP.add_argument("--pseudo-fs", action="store_true",
+                 help="traverse pseudo filesystems like proc and sysfs")
 
 # TODO show disk usage
 
+GRP = ARGS.add_argument_group("Reports")
+GRP.add_argument("--snapshot", metavar="FILE",
+                 help="""scan the whole tree of path and write directory
+                 totals into snapshot FILE""")
+GRP.add_argument("--diff", metavar="SNAPSHOT", nargs="+",
+                 help="""show directories changed most between OLD and NEW
+                 snapshots, or between OLD and current tree""")
+GRP.add_argument("--dupes", action="store_true",
+                 help="""find duplicate files and show reclaimable bytes
+                 for each listed item""")
+GRP.add_argument("--where", metavar="EXPR",
+                 help="""list only items matching EXPR, as soon as they are
+                 known, eg. 'size > 10G and age > 180d'. Attributes: size,
+                 count, age, largest, name, type, owner, group, marker""")
+GRP.add_argument("--top", metavar="N", type=int,
+                 help="""show only N top rows: first by name, largest by size,
+                 newest by time, -r takes the other end. --where shows N first
+                 matches. 0 shows all, default is all except %d for
+                 --diff""" % DEFAULT_DIFF_TOP)
+GRP.add_argument("--index", action="store_true",
+                 help="""answer listing and --where from persistent index,
+                 paths not indexed yet are indexed first. Listed directory
+                 and its subdirectories are checked against the live tree,
+                 --where matches files below paths""")
+GRP.add_argument("--index-update", action="store_true",
+                 help="""update index of paths, reading again only
+                 directories changed since, then list like --index""")
+GRP.add_argument("--index-file", metavar="FILE",
+                 help="index file, default ~/.cache/lss/index.sqlite")
+GRP.add_argument("--browse", action="store_true",
+                 help="""browse directory totals of path interactively,
+                 incomplete directories are refined in background""")
+
 # Ignored ls options:
 # -D, --dired generate output designed for Emacs' dired mode
 # --author               with -l, print the author of each file
@@ -167,6 +268,9 @@ def main(args=sys.argv[1:]):
     if args.debug:
         logging.basicConfig(level=logging.DEBUG)
 
+    if args.snapshot or args.diff:
+        return main_snapshot(args)
+
     filters = [filter_nodot]
     if args.all:
         filters = [filter_all]
@@ -178,18 +282,204 @@ def main(args=sys.argv[1:]):
     if args.sort_size:
         sort_key = "size"
 
-    listing = Listing(show_inode=args.inode,
-                      reverse=args.reverse,
-                      sort_key=sort_key)
+    backend = OS
+    if args.archive:
+        try:
+            backend = open_archive(args.archive)
+        except (OSError, ValueError, tarfile.TarError,
+                zipfile.BadZipFile) as ex:
+            ARGS.error("--archive: %s" % ex)
+    throttle = None
+    if args.nice:
+        nice.lower_priority()
+        throttle = nice.Throttle(rate=args.rate,
+                                 max_pressure=args.max_pressure,
+                                 max_load=args.max_load)
+    if args.browse:
+        if len(args.paths) != 1:
+            ARGS.error("--browse takes one path")
+        browse.browse(args.paths[0],
+                      timeout=args.timeout or browse.SCAN_TIMEOUT,
+                      filters=filters,
+                      follow=args.dereference,
+                      follow_command_line=args.dereference_command_line,
+                      crossmount=args.cross_mount,
+                      backend=backend,
+                      throttle=throttle)
+        return EXIT_OK
+
+    aggregators = [AGGREGATORS[key] for key in args.by]
+    query = None
+    if args.where:
+        try:
+            query = Query(args.where)
+        except ValueError as ex:
+            ARGS.error("--where: %s" % ex)
+        if aggregators or args.dupes:
+            ARGS.error("--by and --dupes are not supported with --where")
+    fields = None
+    if args.fields or args.no_group:
+        fields = get_fields(args)
+    listing_kwds = dict(show_inode=args.inode,
+                        fields=fields,
+                        aggregators=aggregators,
+                        show_budget=bool(args.max_entries or args.max_dirs),
+                        reverse=args.reverse,
+                        sort_key=sort_key,
+                        top=args.top or 0)
+    if args.max_memory:
+        try:
+            max_memory = int(parse_size(args.max_memory))
+        except ValueError as ex:
+            ARGS.error("--max-memory: %s" % ex)
+        listing = SpillingListing(max_memory=max_memory, **listing_kwds)
+    else:
+        listing = Listing(**listing_kwds)
+    if args.index or args.index_update:
+        if aggregators or args.dupes:
+            ARGS.error("--by and --dupes are not supported with --index")
+        return main_index(args, listing, query, filters, sort_key)
+
+    history = History(args.history_file) if args.history else None
     traverse = Traverse(filters=filters,
-                        timeout=args.timeout,
-                        crossmount=args.cross_mount)
+                        timeout=args.timeout or DEFAULT_TIMEOUT,
+                        history=history,
+                        adapt_timeout=args.timeout is None,
+                        follow=args.dereference,
+                        follow_command_line=args.dereference_command_line,
+                        crossmount=args.cross_mount,
+                        aggregators=aggregators + (
+                            [dupes.Files] if args.dupes else []) + (
+                            query.aggregators if query else []),
+                        prune=query.prune if query else None,
+                        max_entries=args.max_entries,
+                        max_dirs=args.max_dirs,
+                        budget_per_item=args.budget_per_item,
+                        backend=backend,
+                        throttle=throttle,
+                        needs=listing.needs | (
+                            query.needs if query else frozenset()),
+                        bytes_paths=True,
+                        mounts=MountTable(
+                            timeout=args.mount_timeout,
+                            concurrency=args.mount_concurrency,
+                            skip_pseudo=not args.pseudo_fs))
 
-    for path in args.paths:
-        for item in traverse(path):
-            listing.add(item)
+    try:
+        return run(args, traverse, listing, query, aggregators)
+    finally:
+        if history is not None:
+            history.save()
+
+
+def get_fields(args):
+    """ Fields in order given, implied ones at their place in layout """
+    fields = args.fields.split(",") if args.fields else list(FIELDS)
+    unknown = set(fields) - set(FIELDS)
+    if unknown:
+        ARGS.error("unknown fields: %s" % ",".join(sorted(unknown)))
+    implied = ["by-" + key for key in args.by]
+    if args.max_entries or args.max_dirs:
+        implied.insert(0, "budget")
+    for name in implied:
+        if name not in fields:
+            following = [fields.index(after) for after in ("mount", "name")
+                         if after in fields]
+            fields.insert(min(following) if following else len(fields),
+                          name)
+    if args.inode and "inode" not in fields:
+        fields.insert(0, "inode")
+    if args.no_group and "group" in fields:
+        fields.remove("group")
+    return fields
+
+
+def run(args, traverse, listing, query, aggregators):
+    if query:
+        shown = 0
+        last = None
+        for item in traverse.many(args.paths):
+            if last is not None and query.match(last):
+                listing.stream(last)
+                shown += 1
+                if shown == args.top:
+                    break
+            elif not isinstance(last, Link):
+                listing.stream()  # write links held so far
+            last = item
+        else:
+            if last is not None and query.match(last):
+                listing.stream(last)
+        listing.stream()
+        return EXIT_OK
+
+    items = []
+    for item in traverse.many(args.paths):
+        if args.dupes:
+            items.append(item)
+        listing.add(item)
+
+    if args.dupes:
+        dupes.print_reclaimable(dupes.reclaimable(items))
+        return EXIT_OK
 
     listing.list()
+    if aggregators:
+        print_sections(listing.sections(), aggregators)
+    return EXIT_OK
+
+
+def main_index(args, listing, query, filters, sort_key):
+    index = Index(args.index_file, crossmount=args.cross_mount)
+    try:
+        if args.index_update:
+            for path in args.paths:
+                index.update(path)
+        if query:
+            def matched():
+                return top((item for path in args.paths
+                            for item in index.files(path)
+                            if query.match(item)), args.top,
+                           key=sort_key, reverse=args.reverse)
+            items = matched()
+            if not index.fresh(items):
+                items = matched()
+        else:
+            items = [item for path in args.paths
+                     for item in index.items(path, filters=filters)]
+        for item in items:
+            listing.add(item)
+        listing.list()
+    finally:
+        index.close()
+    return EXIT_OK
+
+
+def main_snapshot(args):
+    if args.snapshot:
+        if len(args.paths) != 1:
+            ARGS.error("--snapshot takes one path")
+        try:
+            snapshot.write(snapshot.scan(args.paths[0],
+                                         crossmount=args.cross_mount),
+                           args.snapshot)
+        except OSError as ex:
+            ARGS.error("--snapshot: %s" % ex)
+        return EXIT_OK
+    if len(args.diff) > 2:
+        ARGS.error("--diff takes OLD and optional NEW snapshot")
+    try:
+        old = snapshot.SnapshotFile(args.diff[0])
+        if len(args.diff) == 2:
+            new = snapshot.SnapshotFile(args.diff[1])
+        else:
+            new = snapshot.scan(old.root, crossmount=args.cross_mount)
+        changes = snapshot.diff(old, new)
+    except (OSError, ValueError) as ex:
+        ARGS.error("--diff: %s" % ex)
+    snapshot.print_diff(changes,
+                        top=DEFAULT_DIFF_TOP if args.top is None
+                        else args.top)
     return EXIT_OK
 
 
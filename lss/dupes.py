@@ -0,0 +1,163 @@
+"""
+Duplicate file finder.
+
+Regular files are collected with Traverse and grouped by size. Only
+groups with many files are read: first by hash of the first and last
+blocks, and then by hash of the whole file for the files that still
+match. Hard links of one inode are counted once.
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import stat
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from humanize import naturalsize
+
+from . import escape_name
+from .aggregate import Aggregator
+
+log = logging.getLogger(__name__)
+D = log.debug
+
+BLOCK = 4096
+BUFSIZE = 1 << 20
+
+
+class Files(Aggregator):
+    """ Collect regular files below directory as (path, size, dev, ino) """
+
+    name = "files"
+
+    def __init__(self):
+        super().__init__()
+        self.files = []
+
+    def add(self, file):
+        st = file.stat
+        if stat.S_ISREG(st.st_mode) and st.st_size:
+            self.files.append((file.path, st.st_size, st.st_dev, st.st_ino))
+
+    def merge(self, other):
+        self.files.extend(other.files)
+
+
+def partial_hash(path):
+    """ Hash of first and last block of file """
+    digest = hashlib.sha1()
+    with open(path, "rb") as fo:
+        digest.update(fo.read(BLOCK))
+        size = os.fstat(fo.fileno()).st_size
+        if size > BLOCK:
+            fo.seek(max(BLOCK, size - BLOCK))
+            digest.update(fo.read(BLOCK))
+    return digest.digest()
+
+
+def full_hash(path):
+    """ Hash of whole file, read through mmap or big buffers """
+    digest = hashlib.sha1()
+    with open(path, "rb") as fo:
+        try:
+            with mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                digest.update(data)
+        except (OSError, ValueError):
+            for data in iter(lambda: fo.read(BUFSIZE), b""):
+                digest.update(data)
+    return digest.digest()
+
+
+def _hash(args):
+    func, path = args
+    try:
+        return func(path)
+    except OSError as ex:
+        log.error("%s", str(ex))
+        return None
+
+
+def _refine(groups, func, executor):
+    """ Split groups of files by func(path), drop groups of one """
+    files = [file for group in groups for file in group]
+    digests = executor.map(_hash, [(func, file[0]) for file in files],
+                           chunksize=64)
+    refined = {}
+    for file, digest in zip(files, digests):
+        if digest is not None:
+            refined.setdefault((file[1], digest), []).append(file)
+    return [group for group in refined.values() if len(group) > 1]
+
+
+def find_dupes(files, *, executor=None):
+    """ Group files (path, size, dev, ino) with same contents, -> list of
+    groups, each group a list of files of distinct inodes """
+    by_size = {}
+    inodes = set()
+    for file in files:
+        if file[2:] in inodes:
+            continue  # hard link to already seen inode
+        inodes.add(file[2:])
+        by_size.setdefault(file[1], []).append(file)
+    groups = [group for group in by_size.values() if len(group) > 1]
+    D("dupes: %d size groups", len(groups))
+    if not groups:
+        return []
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor()
+    try:
+        groups = _refine(groups, partial_hash, executor)
+        # small files are fully read by partial hash
+        small = [group for group in groups if group[0][1] <= 2 * BLOCK]
+        large = [group for group in groups if group[0][1] > 2 * BLOCK]
+        D("dupes: %d small and %d large candidate groups", len(small),
+          len(large))
+        return small + _refine(large, full_hash, executor)
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+
+def item_files(item):
+    """ Regular files of listing item """
+    for aggregator in item.aggregators:
+        if isinstance(aggregator, Files):
+            return aggregator.files
+    st = item.stat
+    if stat.S_ISREG(st.st_mode) and st.st_size:
+        return [(item.path, st.st_size, st.st_dev, st.st_ino)]
+    return []
+
+
+def reclaimable(items, *, executor=None):
+    """ Find duplicates over listing items traversed with Files
+    aggregator. First copy in items order is kept, -> list of
+    (item, reclaimable bytes, duplicate count) """
+    owner = {}
+    files = []
+    for item in items:
+        for file in item_files(item):
+            owner.setdefault(file[2:], item)
+            files.append(file)
+    result = {item: [0, 0] for item in items}
+    for group in find_dupes(files, executor=executor):
+        for file in group[1:]:
+            result[owner[file[2:]]][0] += file[1]
+            result[owner[file[2:]]][1] += 1
+    return [(item, size, count) for item, (size, count) in result.items()]
+
+
+def print_reclaimable(report, stream=None):
+    """ Write items with duplicates, largest reclaimable first """
+    stream = stream or sys.stdout
+    report = sorted((row for row in report if row[1]),
+                    key=lambda row: row[1], reverse=True)
+    for item, size, count in report:
+        stream.write("%10s %6d %s\n" % (naturalsize(size, gnu=True), count,
+                                        escape_name(item.name)))
+    stream.write("%10s %6d total reclaimable\n" % (
+        naturalsize(sum(row[1] for row in report), gnu=True),
+        sum(row[2] for row in report)))
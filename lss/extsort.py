@@ -0,0 +1,134 @@
+"""
+Listing with bounded memory for directories with millions of entries.
+
+Items are formatted into rows as soon as they are finished, and the
+items are dropped. Column widths are taken while formatting. Rows are
+kept in memory until max_memory is used, then sorted and spilled into a
+temporary file as marshal records. At most MAX_RUNS runs are kept open,
+more are merged into one run first. Output is k-way merge of the
+spilled runs and the rows left in memory. Aggregator totals are merged
+as items are dropped, for print_sections.
+"""
+
+import heapq
+import logging
+import marshal
+import tempfile
+
+from . import Listing, View, NEED_LINK, LINK_BATCH, resolve_links
+
+log = logging.getLogger(__name__)
+D = log.debug
+
+ROW_OVERHEAD = 200  # estimated bytes of tuples and strings of one row
+MAX_RUNS = 64  # open temporary files, fan-in of one merge
+
+
+def _view(viewseq):
+    view = View()
+    for value, color in viewseq:
+        view.append(value, color)
+    return view
+
+
+def _read(fo):
+    fo.seek(0)
+    while True:
+        try:
+            yield marshal.load(fo)
+        except EOFError:
+            return
+
+
+class Totals:
+    """ Aggregators merged over dropped items, stands for them in
+    print_sections. Items without aggregators, files, are added by
+    themselves like print_sections does. """
+
+    def __init__(self, aggregators=()):
+        self.aggregators = [cls() for cls in aggregators]
+
+    def merge(self, item):
+        if item.aggregators:
+            for mine, other in zip(self.aggregators, item.aggregators):
+                mine.merge(other)
+        else:
+            for aggregator in self.aggregators:
+                aggregator.add(item.file)
+
+
+class SpillingListing(Listing):
+    """ Listing keeping at most about max_memory bytes of rows """
+
+    def __init__(self, *, max_memory=64 << 20, aggregators=(), **kwds):
+        super().__init__(aggregators=aggregators, **kwds)
+        self.max_memory = max_memory
+        self.pending = None  # last added item, not finished yet
+        self.finished = []  # items to format, links resolved together
+        self.rows = []  # (key, row) of formatted items
+        self.used = 0
+        self.runs = []  # temporary files of sorted rows
+        self.totals = Totals(aggregators)
+
+    def add(self, item):
+        """ Previous item is finished when next one is added """
+        if self.pending is not None:
+            self.finished.append(self.pending)
+            if len(self.finished) >= LINK_BATCH:
+                self._keep_finished()
+        self.pending = item
+
+    def _keep_finished(self):
+        if NEED_LINK in self.needs:
+            resolve_links(self.finished)
+        for item in self.finished:
+            self._keep(item)
+        self.finished = []
+
+    def _keep(self, item):
+        row = tuple(tuple(view.viewseq) for view in self.format(item))
+        self.rows.append((self.sort_func(item), row))
+        self.totals.merge(item)
+        self.used += ROW_OVERHEAD + sum(
+            len(value) for viewseq in row for value, _ in viewseq)
+        if self.used >= self.max_memory:
+            self._spill()
+
+    def sections(self):
+        return [self.totals]
+
+    def _spill(self):
+        self.rows.sort(key=lambda row: row[0], reverse=self.reverse)
+        self.runs.append(self._dump(self.rows))
+        D("spilled %d rows, %d bytes", len(self.rows), self.runs[-1].tell())
+        self.rows = []
+        self.used = 0
+        if len(self.runs) >= MAX_RUNS:
+            runs = self.runs
+            self.runs = [self._dump(self._merge(runs))]
+            D("merged %d runs, %d bytes", len(runs), self.runs[0].tell())
+            for fo in runs:
+                fo.close()
+
+    def _dump(self, records):
+        fo = tempfile.TemporaryFile()
+        for record in records:
+            marshal.dump(record, fo)
+        return fo
+
+    def _merge(self, runs, rows=()):
+        return heapq.merge(*([_read(fo) for fo in runs] + [iter(rows)]),
+                           key=lambda row: row[0], reverse=self.reverse)
+
+    def list(self):
+        if self.pending is not None:
+            self.finished.append(self.pending)
+            self.pending = None
+        self._keep_finished()
+        self.rows.sort(key=lambda row: row[0], reverse=self.reverse)
+        for _, row in self.shown(self._merge(self.runs, self.rows)):
+            self.write([_view(viewseq) for viewseq in row])
+        for fo in self.runs:
+            fo.close()
+        self.runs = []
+        self.rows = []
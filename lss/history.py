@@ -0,0 +1,98 @@
+"""
+History of previous traverses, entry counts and scan times of listed
+items, to order and budget the next traverse.
+"""
+
+import json
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+D = log.debug
+
+VERSION = 1
+MAX_ITEMS = 20000  # oldest items are dropped over this
+MAX_TIMEOUT_SCALE = 4.0  # adapted timeout is at most this times default
+
+
+def default_path():
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache")
+    return os.path.join(cache, "lss", "history.json")
+
+
+class History:
+    """ Scan costs by absolute path: items are [count, seconds, complete,
+    time], roots are [seconds, complete, time] """
+
+    def __init__(self, path=None):
+        self.path = path or default_path()
+        self.items = {}
+        self.roots = {}
+        try:
+            with open(self.path) as fo:
+                data = json.load(fo)
+            if data.get("version") == VERSION:
+                self.items = data["items"]
+                self.roots = data["roots"]
+        except (OSError, ValueError, KeyError) as ex:
+            D("no history %s: %s", self.path, ex)
+
+    def cost(self, path):
+        """ Seconds previous scan took, or None """
+        record = self.items.get(path)
+        return record[1] if record else None
+
+    def record(self, path, count, seconds, complete):
+        self.items[path] = [count, seconds, complete, time.time()]
+
+    def record_root(self, path, seconds, complete):
+        self.roots[path] = [seconds, complete, time.time()]
+
+    def timeout(self, path, default):
+        """ Timeout for root, enough for what previous scan needed """
+        record = self.roots.get(path)
+        if not record:
+            return default
+        seconds, complete, _ = record
+        if not complete:
+            # previous timeout was not enough, offer more up to limit
+            seconds = max(seconds, default) * 2
+        return min(max(default, seconds * 1.25),
+                   default * MAX_TIMEOUT_SCALE)
+
+    def order(self, entries, path_of):
+        """ Sort entries cheapest first, -> list of (entry, cost). Unknown
+        directories are expected to cost median of known ones. """
+        costs = []
+        unknown = []
+        for entry in entries:
+            cost = self.cost(path_of(entry))
+            if cost is None:
+                if entry.is_dir(follow_symlinks=False):
+                    unknown.append(entry)
+                else:
+                    costs.append((entry, 0.0))
+            else:
+                costs.append((entry, cost))
+        known = sorted(cost for _, cost in costs if cost)
+        median = known[len(known) // 2] if known else 0.0
+        costs.extend((entry, median) for entry in unknown)
+        costs.sort(key=lambda pair: pair[1])
+        return costs
+
+    def save(self):
+        if len(self.items) > MAX_ITEMS:
+            keep = sorted(self.items.items(), key=lambda kv: kv[1][3],
+                          reverse=True)[:MAX_ITEMS]
+            self.items = dict(keep)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as fo:
+                json.dump({"version": VERSION, "items": self.items,
+                           "roots": self.roots}, fo)
+            os.replace(tmp, self.path)
+        except OSError as ex:
+            log.error("%s", str(ex))
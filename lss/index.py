@@ -0,0 +1,288 @@
+"""
+Persistent locate-style index of per-file metadata in SQLite.
+
+Index keeps each directory read with its modification time, and name,
+size, modification time, owner, group and mode of each entry. Update
+walks the tree and reads again only directories whose modification time
+changed, others cost one lstat. Paths are stored as bytes, so any name
+fits.
+
+Listing from index checks the listed directory and its subdirectories
+against the live tree and reads the changed ones again. Changes deeper
+than that are seen after next update. Contents of a file changed in
+place do not change its directory, and are seen only when the directory
+is read again for other reasons.
+"""
+
+import heapq
+import logging
+import os
+from operator import attrgetter
+import sqlite3
+import stat
+
+from . import File, Dir, Link, Regular
+from .query import Largest
+
+log = logging.getLogger(__name__)
+D = log.debug
+
+VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    id INTEGER PRIMARY KEY,
+    path BLOB UNIQUE NOT NULL,
+    parent INTEGER,
+    mtime INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+CREATE TABLE IF NOT EXISTS files (
+    dir INTEGER NOT NULL,
+    name BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    uid INTEGER NOT NULL,
+    gid INTEGER NOT NULL,
+    mode INTEGER NOT NULL,
+    PRIMARY KEY (dir, name)
+);
+"""
+
+# entries below directory, arguments from _below(path)
+BELOW = "(d.path = ? OR d.path >= ? AND d.path < ?)"
+
+
+def default_path():
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache")
+    return os.path.join(cache, "lss", "index.sqlite")
+
+
+def _below(path):
+    if path == b"/":  # root is the prefix of its subdirectories as such
+        return path, path, b"0"
+    return path, path + b"/", path + b"0"  # "0" sorts right after "/"
+
+
+def _stat(size, mtime, uid, gid, mode):
+    mtime = mtime / 1e9
+    return os.stat_result((mode, 0, 0, 1, uid, gid, size,
+                           mtime, mtime, mtime))
+
+
+class Index:
+    """ SQLite index of directory trees """
+
+    def __init__(self, path=None, *, crossmount=False):
+        self.path = path or default_path()
+        self.crossmount = crossmount
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)),
+                        exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, VERSION):
+            raise ValueError("%s: unknown index version %d" % (
+                self.path, version))
+        self.db.executescript(SCHEMA)
+        self.db.execute("PRAGMA user_version = %d" % VERSION)
+        self.linked = {}  # symlink targets of listed items
+        self.read = 0  # directories read by last update or refresh
+        self.checked = 0  # directories checked by lstat
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def _dir(self, path):
+        """ -> (id, mtime) of indexed directory, or None """
+        return self.db.execute("SELECT id, mtime FROM dirs WHERE path = ?",
+                               (path,)).fetchone()
+
+    def update(self, path, *, deep=True):
+        """ Bring index of path up to date. Without deep only path itself
+        and directories not indexed yet are checked. """
+        path = os.fsencode(os.path.abspath(path))
+        try:
+            dev = os.lstat(path).st_dev
+        except OSError as ex:
+            log.error("%s", str(ex))
+            self._forget(path)
+            self.db.commit()
+            return
+        self.read = self.checked = 0
+        parent = self._dir(os.path.dirname(path))
+        stack = [(path, parent[0] if parent else None)]
+        while stack:
+            path, parent = stack.pop()
+            self.checked += 1
+            try:
+                st = os.lstat(path)
+            except OSError as ex:
+                D("gone %s: %s", path, ex)
+                self._forget(path)
+                continue
+            if not stat.S_ISDIR(st.st_mode):
+                self._forget(path)
+                continue
+            row = self._dir(path)
+            if row and row[1] == st.st_mtime_ns:
+                if deep:
+                    stack.extend(self.db.execute(
+                        "SELECT path, parent FROM dirs WHERE parent = ?",
+                        (row[0],)))
+                continue
+            stack.extend(self._read(path, st, row, parent, dev))
+        self.db.commit()
+        D("update read %d of %d dirs", self.read, self.checked)
+
+    def _read(self, path, st, row, parent, dev):
+        """ Read directory entries into index, -> list of (path, id) of
+        subdirectories to update """
+        self.read += 1
+        try:
+            entries = list(os.scandir(path))
+        except OSError as ex:
+            log.error("%s", str(ex))
+            entries = []
+        if row:
+            dir_id = row[0]
+            self.db.execute("UPDATE dirs SET mtime = ? WHERE id = ?",
+                            (st.st_mtime_ns, dir_id))
+            self.db.execute("DELETE FROM files WHERE dir = ?", (dir_id,))
+        else:
+            dir_id = self.db.execute(
+                "INSERT INTO dirs (path, parent, mtime) VALUES (?, ?, ?)",
+                (path, parent, st.st_mtime_ns)).lastrowid
+        rows = []
+        subdirs = []
+        for entry in entries:
+            try:
+                est = entry.stat(follow_symlinks=False)
+            except OSError as ex:
+                D("%s: %s", entry.path, ex)
+                continue
+            rows.append((dir_id, entry.name, est.st_size, est.st_mtime_ns,
+                         est.st_uid, est.st_gid, est.st_mode))
+            if stat.S_ISDIR(est.st_mode) and (
+                    self.crossmount or est.st_dev == dev):
+                subdirs.append((entry.path, dir_id))
+        self.db.executemany(
+            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        # forget removed subdirectories, and kept ones that are changed
+        # to something else
+        current = {path for path, _ in subdirs}
+        old = self.db.execute("SELECT path FROM dirs WHERE parent = ?",
+                              (dir_id,)).fetchall()
+        for (path,) in old:
+            if path not in current:
+                self._forget(path)
+        return subdirs
+
+    def _forget(self, path):
+        """ Remove directory and its subtree from index """
+        ids = "SELECT id FROM dirs d WHERE " + BELOW
+        self.db.execute("DELETE FROM files WHERE dir IN (%s)" % ids,
+                        _below(path))
+        self.db.execute("DELETE FROM dirs WHERE id IN (%s)" % ids,
+                        _below(path))
+
+    def _item(self, path, row, totals=None):
+        name, size, mtime, uid, gid, mode = row
+        file = File(os.fsdecode(os.path.join(path, name)),
+                    stat=_stat(size, mtime, uid, gid, mode))
+        if stat.S_ISDIR(mode):
+            item = Dir(file)
+            largest = Largest()
+            item.aggregators = [largest]
+            if totals is not None:
+                item._size, item.count, mtime, largest.size = totals
+                item._mtime = max(item._mtime, mtime / 1e9)
+                item.complete = True
+        elif stat.S_ISLNK(mode):
+            item = Link(file, cache=self.linked)
+        else:
+            item = Regular(file)
+        item.depth = 1
+        return item
+
+    def items(self, path, *, filters=()):
+        """ Listing items of path entries with directory totals. Path and
+        its subdirectories are checked against live tree first. """
+        bpath = os.fsencode(os.path.abspath(path))
+        if not self._dir(bpath):
+            self.update(path)
+        if not self._dir(bpath):  # not a directory
+            parent, name = os.path.split(bpath)
+            row = self._dir(parent)
+            entry = row and self.db.execute(
+                "SELECT name, size, mtime, uid, gid, mode FROM files "
+                "WHERE dir = ? AND name = ?", (row[0], name)).fetchone()
+            if entry:
+                yield self._item(parent, entry)
+            return
+        self.update(path, deep=False)
+        dir_id = self._dir(bpath)[0]
+        for (subdir,) in self.db.execute(
+                "SELECT path FROM dirs WHERE parent = ?",
+                (dir_id,)).fetchall():
+            self.update(os.fsdecode(subdir), deep=False)
+        for row in self.db.execute(
+                "SELECT name, size, mtime, uid, gid, mode FROM files "
+                "WHERE dir = ?", (dir_id,)).fetchall():
+            if any(filter(os.fsdecode(row[0])) for filter in filters):
+                continue
+            totals = None
+            if stat.S_ISDIR(row[5]):
+                child = os.path.join(bpath, row[0])
+                if self._dir(child):
+                    totals = self.totals(child)
+            yield self._item(bpath, row, totals)
+
+    def totals(self, path):
+        """ -> (size, count, newest mtime, largest size) below directory """
+        size, count, mtime, largest = self.db.execute(
+            "SELECT SUM(f.size), COUNT(*), MAX(f.mtime), MAX(f.size) "
+            "FROM files f JOIN dirs d ON f.dir = d.id WHERE " + BELOW,
+            _below(path)).fetchone()
+        return size or 0, count, mtime or 0, largest or 0
+
+    def files(self, path):
+        """ Listing items of all non-directory entries below path """
+        bpath = os.fsencode(os.path.abspath(path))
+        if not self._dir(bpath):
+            self.update(path)
+        for row in self.db.execute(
+                "SELECT d.path, f.name, f.size, f.mtime, f.uid, f.gid, "
+                "f.mode FROM files f JOIN dirs d ON f.dir = d.id "
+                "WHERE (f.mode & %d) != %d AND %s" % (
+                    0o170000, stat.S_IFDIR, BELOW),
+                _below(bpath)):
+            yield self._item(row[0], row[1:])
+
+    def fresh(self, items):
+        """ Check directories of items against live tree, -> True if none
+        of them changed """
+        changed = False
+        for path in {os.path.dirname(item.path) for item in items}:
+            row = self._dir(os.fsencode(path))
+            try:
+                mtime = os.lstat(path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if row is None or row[1] != mtime:
+                self.update(path, deep=False)
+                changed = True
+        return not changed
+
+
+def top(items, n, *, key="name", reverse=False):
+    """ n first items by name, or n largest or newest by size or mtime.
+    Reverse takes n last by name, or n smallest or oldest. """
+    if not n:
+        return list(items)
+    func = attrgetter(key)
+    if (key == "name") != reverse:
+        return heapq.nsmallest(n, items, key=func)
+    return heapq.nlargest(n, items, key=func)
@@ -13,7 +13,7 @@ def git(file):
         keep_atime = file.atime
         keep_mtime = file.mtime
 
-        repo = Repo(file.path)
+        repo = Repo(os.fsdecode(file.path))
         if repo.untracked_files:
             ret = "G", MARK_MINOR
         elif repo.is_dirty():
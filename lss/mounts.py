@@ -0,0 +1,208 @@
+"""
+Mount table and per filesystem type traverse policies.
+"""
+
+import logging
+import os
+import re
+import threading
+
+log = logging.getLogger(__name__)
+D = log.debug
+
+MOUNTINFO = "/proc/self/mountinfo"
+
+# kernel and virtual filesystems, no point to sum sizes from these
+PSEUDO_FS = frozenset((
+    "autofs", "binfmt_misc", "bpf", "cgroup", "cgroup2", "configfs",
+    "debugfs", "devpts", "efivarfs", "fusectl", "hugetlbfs", "mqueue",
+    "nsfs", "proc", "pstore", "securityfs", "selinuxfs", "sysfs",
+    "tracefs",
+))
+
+# filesystems that may hang on scandir when server is gone
+NETWORK_FS = frozenset((
+    "9p", "afs", "ceph", "cifs", "glusterfs", "lustre", "ncpfs", "nfs",
+    "nfs4", "smb3", "smbfs",
+))
+
+
+class Policy:
+    """ How to traverse directories in a filesystem """
+
+    skip = False
+
+    def scandir(self, path, backend):
+        return backend.scandir(path)
+
+    def lstat(self, path, backend):
+        return backend.lstat(path)
+
+
+class Local(Policy):
+    pass
+
+
+class Skip(Policy):
+    skip = True
+
+
+class MountTimeoutError(OSError):
+    pass
+
+
+class Guarded(Policy):
+    """ Scan directory in daemon worker thread with timeout. Concurrency
+    is limited by semaphore shared by all directories in the mount. A
+    worker stuck in hung syscall is abandoned and keeps its slot until
+    the syscall returns. """
+
+    def __init__(self, *, timeout=2.0, concurrency=2):
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(concurrency)
+
+    def scandir(self, path, backend):
+        return self._run(_scandir_stat, path, backend)
+
+    def lstat(self, path, backend):
+        """ Stat of mount point, the call that hangs first when server is
+        gone """
+        return self._run(backend.lstat, path)
+
+    def _run(self, func, path, *args):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise MountTimeoutError("%s: no free scan slot in %.1fs" % (
+                path, self.timeout))
+        result = []
+        done = threading.Event()
+
+        def worker():
+            try:
+                result.append(func(path, *args))
+            except OSError as ex:
+                result.append(ex)
+            finally:
+                self.slots.release()
+                done.set()
+
+        threading.Thread(target=worker, daemon=True).start()
+        if not done.wait(self.timeout):
+            raise MountTimeoutError("%s: scan timed out after %.1fs" % (
+                path, self.timeout))
+        if isinstance(result[0], OSError):
+            raise result[0]
+        return result[0]
+
+
+def _scandir_stat(path, backend):
+    """ Read directory entries and their stats, DirEntry caches stat """
+    entries = list(backend.scandir(path))
+    for entry in entries:
+        entry.stat(follow_symlinks=False)
+    return entries
+
+
+LOCAL = Local()
+SKIP = Skip()
+
+
+class Mount:
+    def __init__(self, line):
+        fields = line.split()
+        sep = fields.index("-")
+        self.id = int(fields[0])
+        self.parent = int(fields[1])
+        major, minor = fields[2].split(":")
+        self.dev = os.makedev(int(major), int(minor))
+        self.root = unescape(fields[3])
+        self.point = unescape(fields[4])
+        self.options = fields[5]
+        self.fstype = fields[sep + 1]
+        self.source = unescape(fields[sep + 2]) if len(fields) > sep + 2 \
+            else ""
+        self.policy = LOCAL
+
+    def __repr__(self):
+        return "Mount(%r, %r, %r)" % (self.point, self.fstype, self.source)
+
+    @property
+    def is_pseudo(self):
+        return self.fstype in PSEUDO_FS
+
+    @property
+    def is_remote(self):
+        return (self.fstype in NETWORK_FS or self.fstype == "fuse" or
+                self.fstype.startswith("fuse."))
+
+
+def unescape(text):
+    """ mountinfo escapes space, tab, newline and backslash as \\ooo """
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), text)
+
+
+class MountTable:
+    """ Mount index by device and mount point, with policies set from
+    filesystem type. Missing mountinfo gives empty table and local
+    policy everywhere. """
+
+    def __init__(self, path=MOUNTINFO, *, timeout=2.0, concurrency=2,
+                 skip_pseudo=True):
+        self.by_dev = {}
+        self.by_point = {}
+        self.guarded = {}  # mount point -> Guarded policy
+        lines = ()
+        try:
+            if path is not None:
+                with open(path) as fo:
+                    lines = fo.readlines()
+        except OSError as ex:
+            D("no mount table %s", ex)
+        for line in lines:
+            if not line.strip():
+                continue
+            mount = Mount(line)
+            if mount.is_pseudo and skip_pseudo:
+                mount.policy = SKIP
+            elif mount.is_remote:
+                mount.policy = Guarded(timeout=timeout,
+                                       concurrency=concurrency)
+            # later mounts hide earlier ones on same point
+            self.by_dev[mount.dev] = mount
+            self.by_point[mount.point] = mount
+            if isinstance(mount.policy, Guarded):
+                self.guarded[mount.point] = mount.policy
+            else:
+                self.guarded.pop(mount.point, None)
+
+    def __len__(self):
+        return len(self.by_point)
+
+    def policy(self, dev):
+        mount = self.by_dev.get(dev)
+        return mount.policy if mount else LOCAL
+
+    def guard(self, path):
+        """ Guarded policy of mount point path, or None. Mount point is
+        found by path, before its stat can hang. """
+        if not self.guarded:
+            return None
+        return self.guarded.get(os.path.abspath(os.fsdecode(path)))
+
+    def find(self, file):
+        """ Mount of mount point file or None """
+        path = os.path.abspath(os.fsdecode(file.path))
+        mount = self.by_point.get(path)
+        if mount is None:
+            mount = self.by_dev.get(file.dev)
+        return mount
+
+
+_mounts = None
+
+
+def get_mounts():
+    """ Process wide mount table, parsed once """
+    global _mounts
+    if _mounts is None:
+        _mounts = MountTable()
+    return _mounts
@@ -0,0 +1,140 @@
+"""
+Low impact traversing: lower own CPU and I/O priority, limit the rate of
+directory reads and stats, and pause while the system is under I/O
+pressure or high load.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import platform
+import time
+
+log = logging.getLogger(__name__)
+D = log.debug
+
+PRESSURE_IO = "/proc/pressure/io"
+
+# ioprio_set syscall numbers, not in os module
+SYS_IOPRIO_SET = {
+    "x86_64": 251,
+    "i386": 289,
+    "i686": 289,
+    "aarch64": 30,
+    "armv7l": 314,
+    "ppc64le": 273,
+    "s390x": 282,
+}
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_WHO_PROCESS = 1
+
+
+def set_idle_io():
+    """ Set own I/O scheduling class to idle, -> True if done """
+    number = SYS_IOPRIO_SET.get(platform.machine())
+    name = ctypes.util.find_library("c")
+    if number is None or name is None:
+        D("ioprio_set not available")
+        return False
+    libc = ctypes.CDLL(name, use_errno=True)
+    if libc.syscall(number, IOPRIO_WHO_PROCESS, 0,
+                    IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT) != 0:
+        D("ioprio_set failed: %s", os.strerror(ctypes.get_errno()))
+        return False
+    return True
+
+
+def lower_priority():
+    """ Lowest CPU priority and idle I/O class for this process """
+    try:
+        os.setpriority(os.PRIO_PROCESS, 0, 19)
+    except (AttributeError, OSError) as ex:
+        D("setpriority failed: %s", ex)
+    set_idle_io()
+
+
+def io_pressure(path=PRESSURE_IO):
+    """ Percentage of last 10s some task waited I/O, or None """
+    try:
+        with open(path) as fo:
+            for line in fo:
+                if line.startswith("some"):
+                    for field in line.split()[1:]:
+                        key, _, value = field.partition("=")
+                        if key == "avg10":
+                            return float(value)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def load():
+    """ 1 minute load average per CPU, or None """
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+class Throttle:
+    """ Token bucket limiting operations to rate per second, and pausing
+    while I/O pressure or load per CPU is over its limit. Zero disables a
+    limit. """
+
+    def __init__(self, *, rate=1000.0, burst=100, max_pressure=10.0,
+                 max_load=1.0, interval=1.0, clock=time.monotonic,
+                 sleep=time.sleep, pressure=io_pressure, load=load):
+        self.rate = rate
+        self.burst = burst
+        self.max_pressure = max_pressure
+        self.max_load = max_load
+        self.interval = interval  # seconds between system checks
+        self.clock = clock
+        self.sleep = sleep
+        self.pressure = pressure
+        self.load = load
+        self.tokens = burst
+        self.last = clock()
+        self.checked = self.last - interval
+        self.paused = 0.0  # total seconds paused for system
+
+    def __str__(self):
+        return "Throttle(rate=%.0f, tokens=%.1f, paused=%.1fs)" % (
+            self.rate, self.tokens, self.paused)
+
+    def busy(self):
+        """ Is system over pressure or load limits """
+        if self.max_pressure:
+            pressure = self.pressure()
+            if pressure is not None and pressure > self.max_pressure:
+                return True
+        if self.max_load:
+            load = self.load()
+            if load is not None and load > self.max_load:
+                return True
+        return False
+
+    def take(self, *stops):
+        """ Take one operation, sleep as needed. Pause for busy system
+        ends when any of stops, like timeout or budget, is true. """
+        now = self.clock()
+        if now - self.checked >= self.interval:
+            while self.busy():
+                if any(stops):
+                    return
+                D("%s: system busy, pause", self)
+                self.sleep(self.interval)
+                self.paused += self.interval
+            now = self.checked = self.clock()
+        if not self.rate:
+            return
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens < 1:
+            self.sleep((1 - self.tokens) / self.rate)
+            self.tokens = 1
+            self.last = self.clock()
+        self.tokens -= 1
@@ -0,0 +1,332 @@
+"""
+find-style queries over listing items, --where expressions.
+
+Expression compares item attributes and combines comparisons with and,
+or, not and parentheses::
+
+    size > 10G and age > 180d
+    type = f and largest > 1G
+    name ~ '*.log' or owner = root
+
+Attributes are size, count, age, largest (largest file in tree), name,
+type, owner, group and marker. Sizes take K, M, G, T and P suffixes,
+ages s, m, h, d, w and y suffixes.
+
+Directory totals only grow while traversing and the newest modification
+time only gets newer, so a comparison can be decided before the
+directory is fully traversed. Expression is evaluated in three valued
+logic, None is not yet known, and traverse is pruned once the value of
+the whole expression is known.
+"""
+
+import fnmatch
+import re
+import stat
+import time
+
+from . import user_name, group_name, NEED_STAT, NEED_MARKERS
+from .aggregate import Aggregator
+
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30,
+              "T": 1 << 40, "P": 1 << 50}
+AGE_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 24 * 3600,
+             "w": 7 * 24 * 3600, "y": 365 * 24 * 3600}
+TYPES = {
+    "d": stat.S_ISDIR, "f": stat.S_ISREG, "l": stat.S_ISLNK,
+    "p": stat.S_ISFIFO, "s": stat.S_ISSOCK, "c": stat.S_ISCHR,
+    "b": stat.S_ISBLK,
+}
+
+TOKEN = re.compile(r"""\s*(?:
+    (?P<op>>=|<=|!=|=|>|<|~|\(|\)) |
+    '(?P<squote>[^']*)' | "(?P<dquote>[^"]*)" |
+    (?P<word>[^\s()<>=!~'"]+)
+)""", re.VERBOSE)
+
+
+class Largest(Aggregator):
+    """ Size of largest file below directory """
+
+    name = "largest"
+
+    def __init__(self):
+        super().__init__()
+        self.size = 0
+
+    def add(self, file):
+        st = file.stat
+        if stat.S_ISREG(st.st_mode) and st.st_size > self.size:
+            self.size = st.st_size
+
+    def merge(self, other):
+        if other.size > self.size:
+            self.size = other.size
+
+
+def parse_size(text):
+    match = re.match(r"^(\d+(?:\.\d+)?)([KMGTP]?)i?B?$", text, re.I)
+    if not match:
+        raise ValueError("bad size %r" % text)
+    return float(match.group(1)) * SIZE_UNITS[match.group(2).upper()]
+
+
+def parse_age(text):
+    match = re.match(r"^(\d+(?:\.\d+)?)([smhdwy]?)$", text)
+    if not match:
+        raise ValueError("bad age %r" % text)
+    return float(match.group(1)) * AGE_UNITS[match.group(2)]
+
+
+# attribute: (value parser, item value function, direction while
+# traversing: 1 grows, -1 shrinks, 0 static)
+def _largest(item, now):
+    for aggregator in item.aggregators:
+        if isinstance(aggregator, Largest):
+            return aggregator.size
+    return item.size
+
+
+def _type(item, now):
+    for key, pred in TYPES.items():
+        if pred(item.mode):
+            return key
+    return "?"
+
+
+def _owner(item, now):
+    return user_name(item.stat.st_uid)
+
+
+def _group(item, now):
+    return group_name(item.stat.st_gid)
+
+
+ATTRIBUTES = {
+    "size": (parse_size, lambda item, now: item.size, 1),
+    "count": (float, lambda item, now: item.count, 1),
+    "age": (parse_age, lambda item, now: now - item.mtime, -1),
+    "largest": (parse_size, _largest, 1),
+    "name": (str, lambda item, now: item.name, 0),
+    "type": (str, _type, 0),
+    "owner": (str, _owner, 0),
+    "group": (str, _group, 0),
+    "marker": (str, lambda item, now: item.markers, 0),
+}
+
+# traverse work each attribute needs, count and name need none
+ATTRIBUTE_NEEDS = {
+    "size": (NEED_STAT,),
+    "age": (NEED_STAT,),
+    "largest": (NEED_STAT,),
+    "type": (NEED_STAT,),
+    "owner": (NEED_STAT,),
+    "group": (NEED_STAT,),
+    "marker": (NEED_MARKERS,),
+}
+
+COMPARE = {
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+}
+
+
+class Compare:
+    def __init__(self, attr, op, text):
+        if attr not in ATTRIBUTES:
+            raise ValueError("unknown attribute %r" % attr)
+        parser, self.value, self.direction = ATTRIBUTES[attr]
+        if op == "~" and parser is not str:
+            raise ValueError("%s ~ %s: ~ matches names only" % (attr, text))
+        self.attr = attr
+        self.op = op
+        self.operand = parser(text)
+
+    def __repr__(self):
+        return "(%s %s %r)" % (self.attr, self.op, self.operand)
+
+    def test(self, value):
+        if self.attr == "marker":
+            found = self.operand in value
+            return found if self.op in ("=", "~") else not found
+        if self.op == "~":
+            return fnmatch.fnmatch(value, self.operand)
+        return COMPARE[self.op](value, self.operand)
+
+    def decide(self, item, now, final):
+        value = self.value(item, now)
+        result = self.test(value)
+        if final or item.complete:
+            return result
+        if self.attr == "marker":
+            # markers of subdirectories are found while traversing
+            found = result if self.op in ("=", "~") else not result
+            return result if found else None
+        if not self.direction:
+            return result
+        # value moves to direction while traversing
+        ahead = (value > self.operand) if self.direction > 0 \
+            else (value < self.operand)
+        if self.op in (">", ">=") and self.direction > 0 or \
+                self.op in ("<", "<=") and self.direction < 0:
+            return True if result else None
+        if self.op in ("<", "<=") and self.direction > 0 or \
+                self.op in (">", ">=") and self.direction < 0:
+            return False if not result else None
+        if ahead:  # passed operand, = and != are known
+            return result
+        return None
+
+
+class And:
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+    def decide(self, item, now, final):
+        left = self.left.decide(item, now, final)
+        if left is False:
+            return False
+        right = self.right.decide(item, now, final)
+        if right is False:
+            return False
+        if left and right:
+            return True
+        return None
+
+
+class Or:
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+    def decide(self, item, now, final):
+        left = self.left.decide(item, now, final)
+        if left is True:
+            return True
+        right = self.right.decide(item, now, final)
+        if right is True:
+            return True
+        if left is False and right is False:
+            return False
+        return None
+
+
+class Not:
+    def __init__(self, expr):
+        self.expr = expr
+
+    def decide(self, item, now, final):
+        value = self.expr.decide(item, now, final)
+        return None if value is None else not value
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        match = TOKEN.match(text, pos)
+        if not match or match.end() == pos:
+            raise ValueError("syntax error at %r" % text[pos:])
+        pos = match.end()
+        if match.group("op"):
+            tokens.append(("op", match.group("op")))
+        elif match.group("word") is not None:
+            tokens.append(("word", match.group("word")))
+        else:
+            tokens.append(("str", match.group("squote")
+                           if match.group("squote") is not None
+                           else match.group("dquote")))
+    return tokens
+
+
+class Parser:
+    """ expr := term (or term)*, term := factor (and factor)*,
+    factor := not factor | ( expr ) | attr op value """
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.pos = 0
+        self.attrs = set()
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) \
+            else (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise ValueError("unexpected end of expression")
+        self.pos += 1
+        return token
+
+    def parse(self):
+        expr = self.expr()
+        if self.pos != len(self.tokens):
+            raise ValueError("unexpected %r" % self.peek()[1])
+        return expr
+
+    def expr(self):
+        expr = self.term()
+        while self.peek() == ("word", "or"):
+            self.next()
+            expr = Or(expr, self.term())
+        return expr
+
+    def term(self):
+        expr = self.factor()
+        while self.peek() == ("word", "and"):
+            self.next()
+            expr = And(expr, self.factor())
+        return expr
+
+    def factor(self):
+        kind, value = self.next()
+        if (kind, value) == ("word", "not"):
+            return Not(self.factor())
+        if (kind, value) == ("op", "("):
+            expr = self.expr()
+            if self.next() != ("op", ")"):
+                raise ValueError("missing )")
+            return expr
+        if kind != "word":
+            raise ValueError("expected attribute, got %r" % value)
+        kind, op = self.next()
+        if kind != "op" or op not in COMPARE and op != "~":
+            raise ValueError("expected comparison after %s" % value)
+        _, operand = self.next()
+        self.attrs.add(value)
+        return Compare(value, op, operand)
+
+
+class Query:
+    """ Parsed --where expression """
+
+    def __init__(self, text, *, now=None):
+        self.text = text
+        parser = Parser(text)
+        self.expr = parser.parse()
+        self.now = now if now is not None else time.time()
+        self.aggregators = [Largest] if "largest" in parser.attrs else []
+        self.attrs = frozenset(parser.attrs)
+
+    @property
+    def needs(self):
+        """ Traverse needs of attributes in expression """
+        needs = set()
+        for attr in self.attrs:
+            needs.update(ATTRIBUTE_NEEDS.get(attr, ()))
+        return frozenset(needs)
+
+    def prune(self, item):
+        """ Traverse prune callback, True when item result is known """
+        return self.expr.decide(item, self.now, False) is not None
+
+    def match(self, item):
+        """ Result for traversed item, incomplete item is evaluated with
+        values found so far """
+        return bool(self.expr.decide(item, self.now, True))
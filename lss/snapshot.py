@@ -0,0 +1,259 @@
+"""
+Compact binary scan snapshots and snapshot diff.
+
+Snapshot file is a header, fixed size directory records in pre-order and
+a blob of directory names. Each record stores index after its subtree,
+so children are found by skipping and whole subtrees are skipped in
+diff when their fingerprints match. Record fingerprint is a hash over
+the names, sizes and modification times below the directory, and the
+fingerprints of subdirectories, Merkle tree style.
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import stat
+import struct
+import sys
+
+from colorama import Fore, Style
+from humanize import naturalsize
+
+from . import is_tty
+
+log = logging.getLogger(__name__)
+D = log.debug
+
+MAGIC = b"LSSS"
+VERSION = 1
+
+# magic, version, record count
+HEADER = struct.Struct("<4sHxxI")
+# subtree end, name offset, name length, size, count, mtime, fingerprint
+RECORD = struct.Struct("<IIIqqd16s")
+
+
+class Tree:
+    """ Directory aggregate tree, records in pre-order """
+
+    def __init__(self, records=None):
+        self.records = records if records is not None else []
+
+    def __len__(self):
+        return len(self.records)
+
+    def record(self, index):
+        """ -> (end, name, size, count, mtime, fingerprint) """
+        return self.records[index]
+
+    def children(self, index):
+        end = self.record(index)[0]
+        index += 1
+        while index < end:
+            yield index
+            index = self.record(index)[0]
+
+    @property
+    def root(self):
+        return self.record(0)[1]
+
+
+class SnapshotFile(Tree):
+    """ Tree read on demand from memory mapped snapshot file """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        with open(path, "rb") as fo:
+            try:
+                self.map = mmap.mmap(fo.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise ValueError("%s: not a lss snapshot" % path)
+        try:
+            magic, version, self.nrecords = HEADER.unpack_from(self.map, 0)
+        except struct.error:
+            magic = version = None
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError("%s: not a lss snapshot" % path)
+        self.names = HEADER.size + self.nrecords * RECORD.size
+        if len(self.map) < self.names:
+            self.map.close()
+            raise ValueError("%s: truncated snapshot" % path)
+
+    def __len__(self):
+        return self.nrecords
+
+    def record(self, index):
+        end, offset, length, size, count, mtime, fp = RECORD.unpack_from(
+            self.map, HEADER.size + index * RECORD.size)
+        start = self.names + offset
+        if not index < end <= self.nrecords or \
+                start + length > len(self.map):
+            raise ValueError("%s: bad record %d" % (self.path, index))
+        name = os.fsdecode(self.map[start:start + length])
+        return end, name, size, count, mtime, fp
+
+    def close(self):
+        self.map.close()
+
+
+def scan(path, *, crossmount=False):
+    """ Scan full directory tree into Tree """
+    tree = Tree()
+    top = os.lstat(path)
+    if not stat.S_ISDIR(top.st_mode):
+        raise NotADirectoryError(path)
+    _scan(tree.records, os.path.abspath(path), os.path.abspath(path),
+          top.st_mtime, top.st_dev, crossmount)
+    return tree
+
+
+class _Frame:
+    """ Directory being scanned, its aggregate so far """
+
+    __slots__ = ("index", "name", "size", "count", "mtime", "fp", "entries")
+
+    def __init__(self, records, path, name, mtime):
+        self.index = len(records)
+        records.append(None)
+        self.name = name
+        self.size = 0
+        self.count = 0
+        self.mtime = mtime
+        self.fp = hashlib.sha1()
+        try:
+            entries = sorted(os.scandir(path), key=lambda entry: entry.name)
+        except OSError as ex:
+            log.error("%s", str(ex))
+            entries = ()
+        self.entries = iter(entries)
+
+
+def _scan(records, path, name, mtime, dev, crossmount):
+    """ Depth first with own stack, deep trees do not hit recursion
+    limit """
+    stack = [_Frame(records, path, name, mtime)]
+    while stack:
+        frame = stack[-1]
+        entry = next(frame.entries, None)
+        if entry is None:
+            stack.pop()
+            fp = frame.fp.digest()[:16]
+            records[frame.index] = (len(records), frame.name, frame.size,
+                                    frame.count, frame.mtime, fp)
+            if stack:
+                parent = stack[-1]
+                parent.size += frame.size
+                parent.count += frame.count
+                parent.mtime = max(parent.mtime, frame.mtime)
+                parent.fp.update(fp)
+            continue
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError as ex:
+            log.error("%s", str(ex))
+            continue
+        frame.size += st.st_size
+        frame.count += 1
+        frame.mtime = max(frame.mtime, st.st_mtime)
+        frame.fp.update(os.fsencode(entry.name))
+        frame.fp.update(struct.pack("<qd", st.st_size, st.st_mtime))
+        if stat.S_ISDIR(st.st_mode) and (crossmount or st.st_dev == dev):
+            stack.append(_Frame(records, entry.path, entry.name,
+                                st.st_mtime))
+
+
+def write(tree, path):
+    """ Write tree as snapshot file """
+    names = []
+    offset = 0
+    with open(path, "wb") as fo:
+        fo.write(HEADER.pack(MAGIC, VERSION, len(tree)))
+        for index in range(len(tree)):
+            end, name, size, count, mtime, fp = tree.record(index)
+            name = os.fsencode(name)
+            fo.write(RECORD.pack(end, offset, len(name), size, count, mtime,
+                                 fp))
+            names.append(name)
+            offset += len(name)
+        for name in names:
+            fo.write(name)
+
+
+class Change:
+    """ Directory change between trees """
+
+    def __init__(self, path, total, count):
+        self.path = path
+        self.total = total  # size change of the whole subtree
+        self.count = count  # file count change of the whole subtree
+        self.own = total  # size change not explained by subdirectories
+        self.own_count = count
+
+    def __repr__(self):
+        return "Change(%r, own=%d, total=%d, count=%d)" % (
+            self.path, self.own, self.total, self.count)
+
+
+def diff(old, new):
+    """ Compare trees, -> list of Change, largest own size change first.
+    Subtrees with equal fingerprint are skipped. """
+    changes = []
+    _diff(old, 0, new, 0, new.root, changes)
+    changes.sort(key=lambda change: abs(change.own), reverse=True)
+    return changes
+
+
+def _diff(old, oi, new, ni, path, changes):
+    if oi is not None and ni is not None:
+        if old.record(oi)[5] == new.record(ni)[5]:
+            return None
+    orec = old.record(oi) if oi is not None else (0, "", 0, 0, 0, b"")
+    nrec = new.record(ni) if ni is not None else (0, "", 0, 0, 0, b"")
+    change = Change(path, nrec[2] - orec[2], nrec[3] - orec[3])
+    changes.append(change)
+    ochildren = {old.record(i)[1]: i for i in old.children(oi)} \
+        if oi is not None else {}
+    nchildren = [(new.record(i)[1], i) for i in new.children(ni)] \
+        if ni is not None else []
+    for name, i in nchildren:
+        sub = _diff(old, ochildren.pop(name, None), new, i,
+                    os.path.join(path, name), changes)
+        if sub:
+            change.own -= sub.total
+            change.own_count -= sub.count
+    for name, i in ochildren.items():
+        sub = _diff(old, i, new, None, os.path.join(path, name), changes)
+        change.own -= sub.total
+        change.own_count -= sub.count
+    return change
+
+
+def fmt_delta(value, *, size=False):
+    text = naturalsize(abs(value), gnu=True) if size else "%d" % abs(value)
+    return ("+" if value >= 0 else "-") + text
+
+
+def print_diff(changes, *, top=0, stream=None):
+    """ Write changes as rows: own size, total size, count, path """
+    stream = stream or sys.stdout
+    hascolor = is_tty(stream)
+    changes = [change for change in changes
+               if change.own or change.own_count]
+    if top:
+        changes = changes[:top]
+    rows = [(fmt_delta(c.own, size=True), fmt_delta(c.total, size=True),
+             fmt_delta(c.count), c.path, c.own) for c in changes]
+    widths = [max((len(row[i]) for row in rows), default=0)
+              for i in range(3)]
+    for row in rows:
+        if hascolor:
+            stream.write(Fore.RED if row[4] > 0 else Fore.GREEN)
+        stream.write(" ".join(
+            row[i].rjust(widths[i]) for i in range(3)))
+        if hascolor:
+            stream.write(Style.RESET_ALL)
+        stream.write(" %s\n" % row[3])
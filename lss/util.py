@@ -1,4 +1,23 @@
+import grp
+import pwd
 from collections import Iterable
+from functools import lru_cache
 
 def is_iterable(obj):
-    return isinstance(obj, Iterable) and not isinstance(obj, str)
\ No newline at end of file
+    return isinstance(obj, Iterable) and not isinstance(obj, str)
+
+
+@lru_cache(maxsize=None)
+def user_name(uid):
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return str(uid)
+
+
+@lru_cache(maxsize=None)
+def group_name(gid):
+    try:
+        return grp.getgrgid(gid).gr_name
+    except KeyError:
+        return str(gid)
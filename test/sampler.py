@@ -1,3 +1,4 @@
+import os
 from logging import getLogger
 from pathlib import Path
 from subprocess import run
@@ -86,6 +87,29 @@ class link(base):
         return self
 
 
+def mkdirs(root, dirs=3, files=4):
+    """ root/dirN/fileM trees, fileM has M bytes """
+    for d in range(dirs):
+        path = os.path.join(str(root), "dir%d" % d)
+        os.mkdir(path)
+        for f in range(files):
+            with open(os.path.join(path, "file%d" % f), "wb") as fo:
+                fo.write(bytes(f))
+
+
+def by_name(items):
+    return {item.name: item for item in list(items)}
+
+
+def totals(items):
+    return {item.name: (item.size, item.count, item.complete)
+            for item in list(items)}
+
+
+def counts(items):
+    return {item.name: (item.count, item.complete) for item in list(items)}
+
+
 def mktree1():
     dir("sample")(
         file("file1", size=2 ** 20),
@@ -0,0 +1,58 @@
+import io
+import os
+
+from lss import Traverse
+from lss import group_name
+from lss.aggregate import ByExtension, ByOwner, ByModifyAge, ByGroup, \
+    AGGREGATORS, print_sections
+
+
+def mktree(root):
+    os.mkdir(str(root.join("dir")))
+    root.join("dir", "a.txt").write("x" * 10)
+    root.join("dir", "b.TXT").write("x" * 20)
+    root.join("dir", "c.log").write("x" * 5)
+    os.utime(str(root.join("dir", "c.log")), (0, 0))
+
+
+def test_aggregators(tmpdir):
+    mktree(tmpdir)
+    traverse = Traverse(timeout=99,
+                        aggregators=(ByExtension, ByOwner, ByModifyAge))
+    item, = traverse(str(tmpdir))
+    ext, owner, age = item.aggregators
+    assert ext.totals[".txt"] == 30
+    assert ext.totals[".log"] == 5
+    assert owner.totals[os.getuid()] == 35
+    assert age.label(max(age.totals)) == ">1Y"
+    assert age.totals[max(age.totals)] == 5
+    assert ext.top() == (".txt", 30 / 35)
+    stream = io.StringIO()
+    print_sections([item], [ByExtension, ByOwner, ByModifyAge], stream)
+    assert "bytes by extension:" in stream.getvalue()
+
+
+def test_extension_files_only(tmpdir):
+    mktree(tmpdir)
+    os.mkdir(str(tmpdir.join("dir", "sub.d")))
+    item, = Traverse(timeout=99, aggregators=(ByExtension,))(str(tmpdir))
+    assert sorted(item.aggregators[0].totals) == [".log", ".txt"]
+
+
+def test_sections_sum_to_listing(tmpdir):
+    mktree(tmpdir)
+    tmpdir.join("top.txt").write("x" * 100)
+    items = list(Traverse(timeout=99, aggregators=(ByGroup,))(str(tmpdir)))
+    stream = io.StringIO()
+    print_sections(items, [ByGroup], stream)
+    section, = [line for line in stream.getvalue().splitlines()
+                if line.endswith(" " + group_name(os.getgid()))]
+    assert section.split()[0] == "135B"
+    assert sorted(AGGREGATORS) == [
+        "atime-age", "ext", "group", "mtime-age", "owner"]
+
+
+def test_no_aggregators(tmpdir):
+    mktree(tmpdir)
+    item, = Traverse(timeout=99)(str(tmpdir))
+    assert item.aggregators == ()
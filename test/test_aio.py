@@ -0,0 +1,76 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import lss
+from lss import Done, Snapshot
+from sampler import mkdirs
+
+
+def run(coro):
+    return asyncio.new_event_loop().run_until_complete(coro)
+
+
+def test_scan(tmpdir):
+    mkdirs(tmpdir)
+
+    async def collect():
+        events = []
+        async with lss.scan([str(tmpdir), str(tmpdir.join("dir1"))],
+                            timeout=99) as scan:
+            async for event in scan:
+                events.append(event)
+        return events
+
+    events = run(collect())
+    dones = [e for e in events if isinstance(e, Done)]
+    snapshots = [e for e in events if isinstance(e, Snapshot)]
+    assert len(dones) == 2
+    assert not any(done.error for done in dones)
+    assert len(snapshots) == 3 + 4
+    assert all(s.complete for s in snapshots)
+    assert sorted(s.count for s in snapshots if s.name.startswith("dir")) \
+        == [4, 4, 4]
+
+
+def test_scan_cancel(tmpdir):
+    mkdirs(tmpdir)
+
+    async def first():
+        async with lss.scan(str(tmpdir), timeout=99) as scan:
+            async for event in scan:
+                scan.cancel()
+                return event
+
+    assert isinstance(run(first()), Snapshot)
+
+
+def test_scan_queued(tmpdir):
+    """ Timeout starts when the job runs, not while it is queued """
+    mkdirs(tmpdir)
+    executor = ThreadPoolExecutor(max_workers=1)
+    executor.submit(time.sleep, 0.5)
+
+    async def done():
+        async with lss.scan(str(tmpdir), timeout=0.3,
+                            executor=executor) as scan:
+            events = []
+            async for event in scan:
+                events.append(event)
+        return events
+
+    events = run(done())
+    assert events[-1].count == 3
+    assert all(e.complete for e in events if isinstance(e, Snapshot))
+
+
+def test_scan_bad_arguments(tmpdir):
+    async def events():
+        events = []
+        async with lss.scan(str(tmpdir), bogus=1) as scan:
+            async for event in scan:
+                events.append(event)
+        return events
+
+    done, = run(asyncio.wait_for(events(), 5))
+    assert isinstance(done, Done) and isinstance(done.error, TypeError)
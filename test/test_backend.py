@@ -0,0 +1,85 @@
+import io
+import stat
+import tarfile
+import zipfile
+
+import pytest
+
+from lss import Traverse, Dir, Link
+from lss.backend import MemoryBackend, open_archive
+from lss.cli import main
+from sampler import by_name
+
+
+def mkmemory():
+    fs = MemoryBackend(mtime=1000.0)
+    fs.add("dir/a", size=10, mtime=2000.0)
+    fs.add("dir/sub/b", size=20)
+    fs.add("dir/link", target="a")
+    fs.add("file", size=5)
+    return fs
+
+
+def test_memory_backend():
+    fs = mkmemory()
+    listed = by_name(Traverse(timeout=99, backend=fs)("."))
+    assert sorted(listed) == ["dir", "file"]
+    assert isinstance(listed["dir"], Dir)
+    assert listed["dir"].size == 10 + 20 + 1
+    assert listed["dir"].count == 4
+    assert listed["dir"].mtime == 2000.0
+    assert listed["dir"].complete
+    assert fs.stat("dir/link").st_size == 10
+    link = by_name(Traverse(timeout=99, backend=fs)("dir"))["link"]
+    assert isinstance(link, Link)
+    assert link.linked_path() == "a"
+    assert link.linked_file().stat.st_size == 10
+
+
+def test_zip(tmpdir):
+    path = str(tmpdir.join("test.zip"))
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("top/a.txt", "x" * 100)
+        archive.writestr("top/sub/b.txt", "y" * 50)
+    fs = open_archive(path)
+    listed = by_name(Traverse(timeout=99, backend=fs)("."))
+    assert listed["top"].size == 150
+    assert listed["top"].count == 3
+
+
+def test_tar(tmpdir):
+    path = str(tmpdir.join("test.tar"))
+    with tarfile.open(path, "w") as archive:
+        for name, data in (("top/a", b"x" * 100), ("top/b", b"y" * 7)):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+        info = tarfile.TarInfo("top/hard")
+        info.type = tarfile.LNKTYPE
+        info.linkname = "top/a"
+        archive.addfile(info)
+    fs = open_archive(path)
+    assert fs.lstat("top/hard").st_ino == fs.lstat("top/a").st_ino
+    assert stat.S_ISREG(fs.lstat("top/hard").st_mode)
+    listed = by_name(Traverse(timeout=99, backend=fs)("."))
+    assert listed["top"].size == 207
+
+
+def test_tar_missing_link_target(tmpdir):
+    path = str(tmpdir.join("test.tar"))
+    with tarfile.open(path, "w") as archive:
+        info = tarfile.TarInfo("top/hard")
+        info.type = tarfile.LNKTYPE
+        info.linkname = "top/missing"
+        archive.addfile(info)
+    fs = open_archive(path)
+    assert stat.S_ISREG(fs.lstat("top/hard").st_mode)
+
+
+def test_bad_archive(tmpdir, capsys):
+    path = tmpdir.join("bad.zip")
+    path.write("not an archive")
+    for archive in (str(path), str(tmpdir.join("missing.tar"))):
+        with pytest.raises(SystemExit):
+            main(["--archive", archive])
+        assert "--archive:" in capsys.readouterr().err
@@ -0,0 +1,73 @@
+import lss.browse
+from lss import Traverse
+from lss.backend import MemoryBackend
+from lss.browse import Tree
+
+
+def mkmemory():
+    fs = MemoryBackend()
+    for i in range(10):
+        fs.add("top/a/b%d/file%d" % (i % 3, i), size=i, mtime=float(i))
+        fs.add("top/c/file%d" % i, size=100 + i)
+    fs.add("top/file", size=1000)
+    return fs
+
+
+def build(fs, **kwds):
+    tree = Tree("top", backend=fs, **kwds)
+    tree.build(tree.root, "top", **tree.kwds)
+    return tree
+
+
+def test_tree_totals():
+    fs = mkmemory()
+    tree = build(fs, timeout=99)
+    listed = {item.name: item for item in list(
+        Traverse(timeout=99, backend=fs)("top"))}
+    assert tree.root.complete
+    for node in tree.root.children:
+        assert (node.size, node.count) == (listed[node.name].size,
+                                           listed[node.name].count)
+    assert [node.name for node in tree.children(tree.root)] == \
+        ["c", "file", "a"]
+    assert [node.name for node in tree.children(tree.root, "count")] == \
+        ["a", "c", "file"]
+    assert [node.name for node in tree.children(tree.root, "name",
+                                                reverse=True)] == \
+        ["file", "c", "a"]
+    b0 = tree.children(tree.children(tree.root, "name")[0], "name")[0]
+    assert b0.path == "top/a/b0"
+    assert tree.lookup(b0) is b0
+
+
+def test_refine():
+    fs = mkmemory()
+    tree = build(fs, timeout=0, refine_timeout=99)
+    a = tree.children(tree.root, "name")[0]
+    assert a.name == "a"
+    assert not tree.root.complete and not a.complete
+    assert a.count == 0
+    tree.refine(a)
+    assert not tree.attached(a)
+    a = tree.lookup(a)
+    assert a.complete and a.count == 13
+    assert tree.root.count == 3 + 13
+    tree.refine(tree.root)
+    assert tree.root.complete
+    assert tree.root.count == 3 + 13 + 10
+    assert tree.root.size == 1000 + sum(range(10)) + sum(range(100, 110))
+
+
+def test_tree_needs(tmpdir, monkeypatch):
+    tmpdir.join("dir", "file").write("x", ensure=True)
+    made = []
+
+    def traverse(**kwds):
+        made.append(Traverse(**kwds))
+        return made[-1]
+
+    monkeypatch.setattr(lss.browse, "Traverse", traverse)
+    tree = Tree(str(tmpdir), timeout=99)
+    tree.build(tree.root, str(tmpdir), **tree.kwds)
+    assert tree.root.size
+    assert made[0].stat_all and not made[0].markers
@@ -0,0 +1,51 @@
+from lss import Budget, Traverse
+from sampler import mkdirs
+
+
+def test_budget():
+    parent = Budget(max_entries=3)
+    budget = Budget(parent=parent)
+    assert not budget
+    budget.spend(entries=3)
+    assert parent.entries == 3
+    assert budget
+    assert not Budget()
+
+
+def test_max_entries_global(tmpdir):
+    mkdirs(tmpdir)
+    traverse = Traverse(timeout=99, max_entries=4)
+    items = list(traverse(str(tmpdir)))
+    assert sum(item.count for item in items) == 3
+    assert not all(item.complete for item in items)
+
+
+def test_max_entries_per_item(tmpdir):
+    mkdirs(tmpdir)
+    traverse = Traverse(timeout=99, max_entries=3, budget_per_item=True)
+    items = list(traverse(str(tmpdir)))
+    assert len(items) == 3
+    for item in items:
+        assert item.count == 2
+        assert item.budget.entries == 3
+        assert item.budget.dirs == 1
+        assert not item.complete
+
+
+def test_max_dirs_reproducible(tmpdir):
+    mkdirs(tmpdir)
+    counts = [
+        sorted((item.name, item.count) for item in
+               Traverse(timeout=99, max_dirs=2)(str(tmpdir)))
+        for _ in range(3)]
+    assert counts[0] == counts[1] == counts[2]
+
+
+def test_max_entries_nested(tmpdir):
+    tmpdir.join("a", "sub", "deeper", "file0").write("x", ensure=True)
+    for i in range(1, 20):
+        tmpdir.join("a", "sub", "deeper", "file%d" % i).write("x")
+    traverse = Traverse(timeout=99, max_entries=10, budget_per_item=True)
+    item, = list(traverse(str(tmpdir)))
+    assert item.count < 22
+    assert not item.complete
@@ -0,0 +1,36 @@
+import os
+
+from lss import Traverse, fmt_name, escape_name
+from sampler import totals
+
+
+def mktree(tmpdir):
+    top = str(tmpdir.mkdir("top"))
+    for sub in (b"good", b"bad\xff"):
+        path = os.path.join(os.fsencode(top), sub)
+        os.mkdir(path)
+        for name in (b"file", b"f\xfe\x01", b"\xe4\xf6"):
+            with open(os.path.join(path, name), "wb") as fo:
+                fo.write(b"x" * len(name))
+    return top
+
+
+def test_bytes_paths(tmpdir):
+    top = mktree(tmpdir)
+    lazy = Traverse(timeout=99, bytes_paths=True)
+    assert totals(lazy(top)) == totals(Traverse(timeout=99)(top))
+    items = list(Traverse(timeout=99, bytes_paths=True, maxdepth=2)(top))
+    assert len(items) == 8
+    for item in items:
+        assert isinstance(item.name, str) and isinstance(item.path, str)
+        assert os.path.exists(item.path)
+
+
+def test_escape_name(tmpdir):
+    assert escape_name("plain.txt") == "plain.txt"
+    assert escape_name(os.fsdecode(b"bad\xff")) == "bad\\xff"
+    assert escape_name("new\nline") == "new\\x0aline"
+    top = mktree(tmpdir)
+    names = sorted(fmt_name(item)[0] for item in list(
+        Traverse(timeout=99, bytes_paths=True)(top)))
+    assert names == ["bad\\xff", "good"]
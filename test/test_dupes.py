@@ -0,0 +1,76 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from lss import Traverse, File, Regular
+from lss.cli import main
+from lss.dupes import Files, find_dupes, reclaimable, print_reclaimable
+
+
+def write(path, data):
+    with open(str(path), "wb") as fo:
+        fo.write(data)
+
+
+def mktree(root):
+    os.mkdir(str(root.join("a")))
+    os.mkdir(str(root.join("b")))
+    big = os.urandom(20000)
+    write(root.join("a", "big"), big)
+    write(root.join("b", "big"), big)
+    # same size, first and last block same, middle differs
+    write(root.join("b", "other"), big[:8192] + bytes(3616) + big[-8192:])
+    os.link(str(root.join("a", "big")), str(root.join("a", "hardlink")))
+    write(root.join("a", "small"), b"small")
+    write(root.join("b", "small"), b"small")
+
+
+def collect(root):
+    items = list(Traverse(timeout=99, aggregators=(Files,))(str(root)))
+    return [file for item in items for file in item.aggregators[0].files]
+
+
+def test_find_dupes(tmpdir):
+    mktree(tmpdir)
+    groups = find_dupes(collect(tmpdir), executor=ThreadPoolExecutor())
+    names = sorted(sorted(os.path.relpath(file[0], str(tmpdir))
+                          for file in group) for group in groups)
+    assert len(names) == 2
+    assert names[1] == ["a/small", "b/small"]
+    assert len(names[0]) == 2
+    assert "b/other" not in names[0]
+
+
+def test_reclaimable(tmpdir):
+    mktree(tmpdir)
+    items = list(Traverse(timeout=99, aggregators=(Files,))(str(tmpdir)))
+    report = reclaimable(items, executor=ThreadPoolExecutor())
+    assert sum(size for _, size, _ in report) == 20000 + 5
+    assert sum(count for _, _, count in report) == 2
+
+
+def test_files_nested_paths(tmpdir):
+    tmpdir.join("a", "sub", "file").write("x", ensure=True)
+    items = list(Traverse(timeout=99, aggregators=(Files,)).many(
+        [str(tmpdir), str(tmpdir.join("a"))]))
+    a, = [item for item in items if item.name == "a"]
+    assert [os.path.basename(file[0]) for file in a.aggregators[0].files] \
+        == ["file"]
+
+
+def test_print_escaped(tmpdir):
+    item = Regular(File(str(tmpdir.join("bad\x1bname")), stat=os.lstat(
+        str(tmpdir))))
+    stream = io.StringIO()
+    print_reclaimable([(item, 10, 1)], stream)
+    assert "\x1b" not in stream.getvalue()
+    assert "bad\\x1bname" in stream.getvalue()
+
+
+def test_where_not_combined(tmpdir, capsys):
+    for args in (["--dupes"], ["--by", "ext"]):
+        with pytest.raises(SystemExit):
+            main(args + ["--where", "size > 0", str(tmpdir)])
+        assert "--where" in capsys.readouterr().err
@@ -0,0 +1,74 @@
+from lss import Traverse, Listing
+from lss.backend import MemoryBackend
+from lss import extsort
+from lss.extsort import SpillingListing
+from lss.aggregate import ByExtension, print_sections
+
+
+def mkmemory():
+    fs = MemoryBackend()
+    for i in range(200):
+        fs.add("big/d%03d/file.%s" % ((i * 7) % 200, "ab"[i % 2]),
+               size=i, mtime=float(i))
+    return fs
+
+
+def add(listing, fs=None, **kwds):
+    for item in Traverse(timeout=99, backend=fs or mkmemory(), **kwds)("big"):
+        listing.add(item)
+    return listing
+
+
+def test_spill_same_output(capsys):
+    for kwds in ({}, {"sort_key": "size"},
+                 {"sort_key": "mtime", "reverse": True}):
+        add(Listing(**kwds)).list()
+        expected = capsys.readouterr().out
+        spilling = add(SpillingListing(max_memory=2000, **kwds))
+        assert len(spilling.runs) > 1
+        spilling.list()
+        assert capsys.readouterr().out == expected
+        assert len(expected.splitlines()) == 200
+
+
+def test_bounded_runs(capsys, monkeypatch):
+    monkeypatch.setattr(extsort, "MAX_RUNS", 3)
+    add(Listing(sort_key="size")).list()
+    expected = capsys.readouterr().out
+    spilling = add(SpillingListing(max_memory=1000, sort_key="size"))
+    assert 1 <= len(spilling.runs) < 3
+    spilling.list()
+    assert capsys.readouterr().out == expected
+
+
+def test_spill_totals(capsys):
+    fs = mkmemory()
+    fs.add("big/top.c", size=1000)
+    listing = add(Listing(aggregators=[ByExtension]), fs,
+                  aggregators=[ByExtension])
+    print_sections(listing.sections(), [ByExtension])
+    expected = capsys.readouterr().out
+    listing = add(SpillingListing(max_memory=2000,
+                                  aggregators=[ByExtension]), fs,
+                  aggregators=[ByExtension])
+    listing.list()
+    capsys.readouterr()
+    print_sections(listing.sections(), [ByExtension])
+    out = capsys.readouterr().out
+    assert ".a" in out and ".b" in out and ".c" in out
+    assert out == expected
+
+
+def test_spill_top(capsys):
+    for kwds in ({"sort_key": "size"}, {"sort_key": "size", "reverse": True},
+                 {"sort_key": "name"}):
+        add(Listing(**kwds)).list()
+        lines = capsys.readouterr().out.splitlines()
+        add(Listing(top=5, **kwds)).list()
+        expected = capsys.readouterr().out
+        if kwds["sort_key"] == "size" and not kwds.get("reverse"):
+            assert expected.splitlines() == lines[-5:]
+        else:
+            assert expected.splitlines() == lines[:5]
+        add(SpillingListing(max_memory=2000, top=5, **kwds)).list()
+        assert capsys.readouterr().out == expected
@@ -0,0 +1,43 @@
+from lss import Traverse, Listing, NEED_STAT
+from lss.backend import MemoryBackend
+from lss.cli import main
+from sampler import counts
+
+
+def mkmemory():
+    fs = MemoryBackend()
+    for i in range(10):
+        fs.add("dir/sub%d/file" % (i % 3), size=i)
+        fs.add("dir/file%d" % i, size=i)
+    return fs
+
+
+def test_needs():
+    assert NEED_STAT in Listing().needs
+    listing = Listing(fields=["count", "name"])
+    assert [column.name for column in listing.columns] == ["count", "name"]
+    assert listing.needs == frozenset()
+    assert NEED_STAT in Listing(fields=["name"], sort_key="size").needs
+
+
+def test_count_only_traverse():
+    fs = mkmemory()
+    lazy = Traverse(timeout=99, backend=fs, needs=frozenset())
+    assert not lazy.stat_all
+    assert counts(lazy(".")) == counts(
+        Traverse(timeout=99, backend=fs)("."))
+    # files are not stat'ed, only directory sizes are summed
+    item, = list(Traverse(timeout=99, backend=fs, needs=frozenset())("."))
+    assert item.size == 0
+    item, = list(Traverse(timeout=99, backend=fs)("."))
+    assert item.size == sum(range(10)) + 7 + 8 + 9
+
+
+def test_fields_order(tmpdir, capsys):
+    tmpdir.join("dir", "file").write("x" * 2000, ensure=True)
+    main(["-T", "99", "--fields", "name,size", str(tmpdir)])
+    assert capsys.readouterr().out == "dir 2.0K\n"
+    main(["-T", "99", "--fields", "size,name", str(tmpdir)])
+    assert capsys.readouterr().out == "2.0K dir\n"
+    main(["-T", "99", "--fields", "size,complete,name", str(tmpdir)])
+    assert capsys.readouterr().out == "2.0K dir\n"
@@ -0,0 +1,61 @@
+import os
+
+from lss import Traverse, Dir, Link
+from sampler import by_name
+
+
+def mkfarm(root):
+    root = str(root)
+    os.makedirs(os.path.join(root, "store", "pkg"))
+    with open(os.path.join(root, "store", "pkg", "data"), "wb") as fo:
+        fo.write(bytes(1000))
+    os.mkdir(os.path.join(root, "farm"))
+    os.symlink(os.path.join(root, "store", "pkg"),
+               os.path.join(root, "farm", "pkg1"))
+    os.symlink(os.path.join(root, "store", "pkg"),
+               os.path.join(root, "farm", "pkg2"))
+    os.symlink(root, os.path.join(root, "farm", "loop"))
+
+
+def test_no_follow(tmpdir):
+    mkfarm(tmpdir)
+    farm = by_name(Traverse(timeout=99)(str(tmpdir.join("farm"))))
+    assert isinstance(farm["pkg1"], Link)
+    assert farm["pkg1"].linked_file() is not None
+
+
+def test_follow(tmpdir):
+    mkfarm(tmpdir)
+    farm = by_name(Traverse(timeout=99, follow=True)(
+        str(tmpdir.join("farm"))))
+    assert isinstance(farm["pkg1"], Dir)
+    assert farm["pkg1"].size == 1000
+    assert farm["pkg1"].complete
+    # cycle through root is walked once, shared pkg counted once
+    loop = farm["loop"]
+    assert loop.complete
+    assert loop.count == 4  # store, pkg, data, farm
+    # only directories are kept in visited set, not single link files
+    assert len(loop.visited) == 4
+
+
+def test_follow_hard_links(tmpdir):
+    mkfarm(tmpdir)
+    os.link(str(tmpdir.join("store", "pkg", "data")),
+            str(tmpdir.join("store", "data")))
+    store = by_name(Traverse(timeout=99, follow=True, filters=())(
+        str(tmpdir)))["store"]
+    assert store.size == 1000 + os.lstat(str(tmpdir.join("store", "pkg")))\
+        .st_size
+    assert len(store.visited) == 3  # store, pkg, data
+
+
+def test_follow_command_line(tmpdir):
+    mkfarm(tmpdir)
+    link = tmpdir.join("data")
+    link.mksymlinkto(tmpdir.join("store", "pkg", "data"))
+    top, = Traverse(timeout=99)(str(link))
+    assert isinstance(top, Link)
+    top, = Traverse(timeout=99, follow_command_line=True)(str(link))
+    assert not isinstance(top, Link)
+    assert top.size == 1000
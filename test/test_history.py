@@ -0,0 +1,69 @@
+import types
+
+import pytest
+
+import lss
+from lss import Traverse
+from lss.backend import MemoryBackend
+from lss.history import History
+
+
+def mkmemory():
+    fs = MemoryBackend()
+    for name, count in (("a", 50), ("b", 5), ("c", 20)):
+        for i in range(count):
+            fs.add("%s/file%d" % (name, i), size=1)
+    fs.add("file", size=1)
+    return fs
+
+
+def test_history_order(tmpdir):
+    path = str(tmpdir.join("history.json"))
+    fs = mkmemory()
+    history = History(path)
+    items = list(Traverse(timeout=99, backend=fs, history=history)("."))
+    assert all(item.complete for item in items)
+    assert history_key(tmpdir, "file", history) is None
+    history.save()
+
+    history = History(path)
+    for name, cost in (("a", 3.0), ("b", 0.1), ("c", 1.0)):
+        entry = history.items[history_key(tmpdir, name, history)]
+        entry[1] = cost
+    names = [item.name for item in
+             Traverse(timeout=99, backend=fs, history=history)(".")]
+    assert names == ["file", "b", "c", "a"]
+
+
+def history_key(tmpdir, name, history):
+    for path in history.items:
+        if path.endswith("/" + name):
+            return path
+
+
+def test_history_deadline(tmpdir, monkeypatch):
+    history = History(str(tmpdir.join("history.json")))
+    fs = mkmemory()
+    list(Traverse(timeout=99, backend=fs, history=history)("."))
+    for path in history.items:
+        history.items[path][1] = 100.0 if path.endswith("/a") else 0.0
+    # stopped clock, timeout and deadlines never pass
+    monkeypatch.setattr(lss, "time", types.SimpleNamespace(
+        monotonic=lambda: 1000.0))
+    traverse = Traverse(timeout=0.2, backend=fs, history=history)
+    items = list(traverse("."))
+    assert items[-1].name == "a"
+    assert items[-1].budget.deadline == pytest.approx(1000.2)
+    assert items[-1].complete
+    assert not any(item.budget.deadline for item in items[:-1])
+
+
+def test_adapt_timeout(tmpdir):
+    history = History(str(tmpdir.join("history.json")))
+    assert history.timeout("/root", 0.5) == 0.5
+    history.record_root("/root", 1.0, True)
+    assert history.timeout("/root", 0.5) == 1.25
+    history.record_root("/root", 0.5, False)
+    assert history.timeout("/root", 0.5) == 1.25
+    history.record_root("/root", 10.0, False)
+    assert history.timeout("/root", 0.5) == 2.0
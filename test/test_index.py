@@ -0,0 +1,107 @@
+import os
+import sqlite3
+
+from lss import Traverse, Dir
+from lss.cli import main
+from lss.index import Index, top, BELOW, _below
+from lss.query import Query
+from sampler import totals
+
+
+def mktree(tmpdir):
+    top = tmpdir.mkdir("top")
+    for i in range(12):
+        top.join("d%d" % (i % 3), "e%d" % (i % 2), "f%d" % i).write(
+            "x" * i, ensure=True)
+        top.join("file%d" % i).write("y" * (100 + i))
+    return str(top)
+
+
+def test_index_items(tmpdir):
+    top = mktree(tmpdir)
+    index = Index(str(tmpdir.join("index")))
+    assert totals(index.items(top)) == \
+        totals(list(Traverse(timeout=99)(top)))
+    for item in index.items(top):
+        assert not isinstance(item, Dir) or item.complete
+    index.update(top)
+    assert index.read == 0 and index.checked == 1 + 3 + 6
+    index.close()
+
+    # changed directories are read again
+    tmpdir.join("top", "d1", "e1", "new").write("z" * 1000)
+    tmpdir.join("top", "d2").remove()
+    index = Index(str(tmpdir.join("index")))
+    index.update(top)
+    assert index.read == 2
+    assert totals(index.items(top)) == \
+        totals(list(Traverse(timeout=99)(top)))
+
+
+def test_index_fresh(tmpdir):
+    top = mktree(tmpdir)
+    index = Index(str(tmpdir.join("index")))
+    list(index.items(top))
+    # listed directory and its subdirectories are checked
+    tmpdir.join("top", "late").write("late")
+    tmpdir.join("top", "d0", "late").write("late")
+    names = totals(index.items(top))
+    assert "late" in names
+    assert names["d0"][1] == 2 + 4 + 1
+
+
+def test_index_query(tmpdir):
+    top_path = mktree(tmpdir)
+    index = Index(str(tmpdir.join("index")))
+    query = Query("size > 5 and size < 100")
+    items = top((item for item in index.files(top_path)
+                 if query.match(item)), 3, key="size")
+    assert [item.size for item in items] == [11, 10, 9]
+    assert index.fresh(items)
+    tmpdir.join("top", "d2", "e1", "big").write("b" * 50)
+    assert not index.fresh(items)
+    items = top((item for item in index.files(top_path)
+                 if query.match(item)), 3, key="size")
+    assert [item.name for item in items] == ["big", "f11", "f10"]
+    assert os.path.exists(items[0].path)
+
+
+def test_below_root():
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE dirs (path BLOB)")
+    paths = [b"/", b"/a", b"/a/b", b"/ab", b"/a0"]
+    db.executemany("INSERT INTO dirs VALUES (?)", [(p,) for p in paths])
+
+    def below(path):
+        return sorted(row[0] for row in db.execute(
+            "SELECT path FROM dirs d WHERE " + BELOW, _below(path)))
+
+    assert below(b"/") == sorted(paths)
+    assert below(b"/a") == [b"/a", b"/a/b"]
+
+
+def test_top_reverse(tmpdir):
+    top_path = mktree(tmpdir)
+    index = Index(str(tmpdir.join("index")))
+    items = list(index.files(top_path))
+    assert [item.size for item in top(items, 3, key="size",
+                                      reverse=True)] == [0, 1, 2]
+    assert [item.name for item in top(items, 2, reverse=True)] == \
+        ["file9", "file8"]
+
+
+def test_where_all(tmpdir, capsys):
+    top_path = mktree(tmpdir)
+    main(["--index", "--index-file", str(tmpdir.join("index")),
+          "--where", "size > 0", top_path])
+    assert len(capsys.readouterr().out.splitlines()) == 23
+    main(["--index", "--index-file", str(tmpdir.join("index")),
+          "--where", "size > 0", "--top", "5", top_path])
+    assert len(capsys.readouterr().out.splitlines()) == 5
+
+
+def test_index_listing_top(tmpdir, capsys):
+    top_path = mktree(tmpdir)
+    main(["--index", "--index-file", str(tmpdir.join("index")), "--top", "2",
+          "-i", "--fields", "inode,name", top_path])
+    assert capsys.readouterr().out.split() == ["d0", "d1"]
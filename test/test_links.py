@@ -0,0 +1,72 @@
+from lss import Traverse, Listing, Link, resolve_links, fmt_symlink
+from lss.backend import MemoryBackend
+from lss.extsort import SpillingListing
+from lss.lscolor import ls_color
+
+
+class CountingBackend(MemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.lstats = []
+
+    def lstat(self, path):
+        self.lstats.append(path)
+        return super().lstat(path)
+
+
+def mkmemory():
+    fs = CountingBackend()
+    fs.add("top/target", size=10)
+    for i in range(20):
+        fs.add("top/link%02d" % i, target="target")
+        fs.add("top/orphan%02d" % i, target="missing")
+    return fs
+
+
+def test_resolve_links():
+    fs = mkmemory()
+    items = list(Traverse(timeout=99, backend=fs)("top"))
+    links = [item for item in items if isinstance(item, Link)]
+    assert len(links) == 40
+    del fs.lstats[:]
+    resolve_links(items)
+    assert sorted(fs.lstats) == ["top/missing", "top/target"]
+    del fs.lstats[:]
+    for link in links:
+        name, color = fmt_symlink(link)
+        if link.name.startswith("orphan"):
+            assert (name, color) == ("missing", ls_color("or"))
+        else:
+            assert name == "target"
+    assert fs.lstats == []
+
+
+def test_list_links(capsys):
+    fs = mkmemory()
+    listing = Listing(fields=["name", "link"])
+    for item in Traverse(timeout=99, backend=fs)("top"):
+        listing.add(item)
+    listing.list()
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "link00 -> target"
+    assert lines[20] == "orphan00 -> missing"
+    assert len(lines) == 41
+
+
+def test_stream_and_spill_links(capsys):
+    for listing in (Listing(fields=["name", "link"]),
+                    SpillingListing(max_memory=2000, fields=["name", "link"])):
+        fs = mkmemory()
+        items = list(Traverse(timeout=99, backend=fs)("top"))
+        del fs.lstats[:]
+        if isinstance(listing, SpillingListing):
+            for item in items:
+                listing.add(item)
+            listing.list()
+        else:
+            for item in items:
+                listing.stream(item)
+            listing.stream()
+        assert sorted(fs.lstats) == ["top/missing", "top/target"]
+        lines = capsys.readouterr().out.splitlines()
+        assert "link00 -> target" in lines and len(lines) == 41
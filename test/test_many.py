@@ -0,0 +1,81 @@
+import os
+
+from git import Repo
+
+from lss import Traverse, BATCH_MIN
+from sampler import totals
+
+
+def mktree(root):
+    os.makedirs(str(root.join("data", "a", "deep")))
+    root.join("data", "a", "deep", "file").write("x" * 100)
+    root.join("data", "a", ".hidden").write("x" * 10)
+    root.join("data", "b").write("x" * 7)
+
+
+def test_nested_paths_share(tmpdir):
+    mktree(tmpdir)
+    data = str(tmpdir.join("data"))
+    alone = totals(list(Traverse(timeout=99)(data)))
+    items = list(Traverse(timeout=99).many([data, os.path.join(data, "a")]))
+    names = sorted(item.name for item in items)
+    assert names == ["a", "b", "deep"]
+    assert totals(i for i in items if i.name != "deep") == alone
+
+
+def test_duplicate_paths(tmpdir):
+    mktree(tmpdir)
+    data = str(tmpdir.join("data"))
+    items = list(Traverse(timeout=99).many([data, data + "/", data]))
+    assert sorted(item.name for item in items) == ["a", "b"]
+
+
+def test_many_files(tmpdir):
+    paths = []
+    for i in range(BATCH_MIN + 1):
+        path = tmpdir.join("f%d" % i)
+        path.write("x" * i)
+        paths.append(str(path))
+    items = list(Traverse(timeout=99).many(paths + paths[:2]))
+    assert len(items) == len(paths)
+    assert sorted(item.size for item in items) == list(range(len(paths)))
+
+
+def test_nested_paths_keep_markers(tmpdir):
+    mktree(tmpdir)
+    proj = tmpdir.join("data", "a")
+    Repo.init(str(proj))
+    data = str(tmpdir.join("data"))
+    alone = {item.name: item.markers for item in list(
+        Traverse(timeout=99)(data))}
+    assert "G" in alone["a"]
+    items = list(Traverse(timeout=99).many([data, str(proj)]))
+    a, = [item for item in items if item.name == "a"]
+    assert a.markers == alone["a"]
+
+
+def test_many_linked_dir(tmpdir):
+    mktree(tmpdir)
+    os.mkdir(str(tmpdir.join("b")))
+    tmpdir.join("b", "lnk").mksymlinkto(tmpdir.join("data"))
+    for n in (1, BATCH_MIN):
+        paths = [str(tmpdir.join("b", "lnk"))]
+        for i in range(n - 1):
+            tmpdir.join("b", "f%d" % i).write("x")
+            paths.append(str(tmpdir.join("b", "f%d" % i)))
+        items = list(Traverse(timeout=99).many(paths))
+        names = {item.name for item in items}
+        assert {"a", "b"} <= names and "lnk" not in names
+
+
+def test_nested_paths_incomplete(tmpdir):
+    mktree(tmpdir)
+    for i in range(20):
+        tmpdir.join("data", "a", "deep", "f%d" % i).write("x")
+    data = str(tmpdir.join("data"))
+    items = list(Traverse(timeout=99, max_entries=10, budget_per_item=True)
+                 .many([data, os.path.join(data, "a")]))
+    deep, = [item for item in items if item.name == "deep"]
+    a, = [item for item in items if item.name == "a"]
+    assert not deep.complete
+    assert not a.complete
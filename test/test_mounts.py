@@ -0,0 +1,76 @@
+import os
+import time
+
+from lss import Traverse
+from lss.backend import OS, OSBackend
+from lss.mounts import MountTable, Skip, Guarded, Local
+
+MOUNTINFO = """\
+23 28 0:22 / /proc rw,relatime - proc proc rw
+28 1 254:0 / / rw,relatime - ext4 /dev/vda rw
+29 28 0:50 / /mnt/nfs\\040share rw shared:1 - nfs4 server:/export rw
+30 28 0:51 / /mnt/fuse rw - fuse.sshfs host: rw
+"""
+
+
+def mktable(tmpdir, text=MOUNTINFO):
+    path = tmpdir.join("mountinfo")
+    path.write(text)
+    return MountTable(str(path), timeout=1.0)
+
+
+def test_mount_table(tmpdir):
+    table = mktable(tmpdir)
+    assert len(table) == 4
+    assert isinstance(table.policy(os.makedev(0, 22)), Skip)
+    assert isinstance(table.policy(os.makedev(254, 0)), Local)
+    assert isinstance(table.policy(os.makedev(0, 51)), Guarded)
+    nfs = table.by_point["/mnt/nfs share"]
+    assert nfs.fstype == "nfs4"
+    assert nfs.source == "server:/export"
+    assert nfs.is_remote
+
+
+def test_missing_mount_table(tmpdir):
+    table = MountTable(str(tmpdir.join("missing")))
+    assert isinstance(table.policy(os.makedev(0, 22)), Local)
+
+
+def test_guarded_scandir(tmpdir):
+    tmpdir.join("file").write("x")
+    entries = Guarded(timeout=5.0).scandir(str(tmpdir), OS)
+    assert [entry.name for entry in entries] == ["file"]
+
+
+def test_traverse_skip(tmpdir):
+    os.mkdir(str(tmpdir.join("dir")))
+    tmpdir.join("dir", "file").write("x")
+    dev = os.lstat(str(tmpdir)).st_dev
+    text = "1 0 %d:%d / / rw - proc proc rw\n" % (
+        os.major(dev), os.minor(dev))
+    traverse = Traverse(timeout=99, mounts=mktable(tmpdir, text))
+    items = list(traverse(str(tmpdir)))
+    assert [item.count for item in items if item.name == "dir"] == [0]
+
+
+def test_guarded_mount_point_stat(tmpdir, monkeypatch):
+    """ Hanging stat of network mount point times out in parent listing """
+    os.mkdir(str(tmpdir.join("dir")))
+    os.mkdir(str(tmpdir.join("dir", "nfs")))
+    tmpdir.join("dir", "file").write("x")
+    nfs = str(tmpdir.join("dir", "nfs"))
+    text = "1 0 0:99 / %s rw - nfs4 server:/export rw\n" % nfs
+    table = mktable(tmpdir, text)
+    lstat = os.lstat
+
+    def hanging(path):
+        if os.fsdecode(path) == nfs:
+            time.sleep(2)
+        return lstat(path)
+
+    monkeypatch.setattr(OSBackend, "lstat", staticmethod(hanging))
+    start = time.monotonic()
+    items = list(Traverse(timeout=99, mounts=table)(str(tmpdir)))
+    assert time.monotonic() - start < 1.5
+    item, = [item for item in items if item.name == "dir"]
+    assert item.count == 1 and not item.complete
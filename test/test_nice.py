@@ -0,0 +1,72 @@
+from lss import Traverse
+from lss.backend import MemoryBackend
+from lss.nice import Throttle, io_pressure
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, secs):
+        self.slept.append(secs)
+        self.now += secs
+
+
+def test_rate():
+    clock = Clock()
+    throttle = Throttle(rate=10, burst=1, max_pressure=0, max_load=0,
+                        clock=clock, sleep=clock.sleep)
+    for _ in range(11):
+        throttle.take()
+    assert abs(clock.now - 1.0) < 1e-9
+
+
+def test_pause_while_busy():
+    clock = Clock()
+    pressures = [50.0, 20.0, 1.0]
+    throttle = Throttle(rate=0, max_pressure=10.0, max_load=0,
+                        clock=clock, sleep=clock.sleep,
+                        pressure=lambda: pressures.pop(0))
+    throttle.take()
+    assert throttle.paused == 2.0
+    assert clock.slept == [1.0, 1.0]
+
+
+def test_pause_stops():
+    clock = Clock()
+
+    class Deadline:
+        def __bool__(self):
+            return clock.now >= 3.0
+
+    throttle = Throttle(rate=0, max_pressure=10.0, max_load=0,
+                        clock=clock, sleep=clock.sleep,
+                        pressure=lambda: 99.0)
+    throttle.take(Deadline())
+    assert throttle.paused == 3.0
+    throttle.take(Deadline())
+    assert throttle.paused == 3.0
+
+
+def test_io_pressure(tmpdir):
+    path = tmpdir.join("io")
+    path.write("some avg10=12.50 avg60=1.00 avg300=0.00 total=1\n"
+               "full avg10=3.00 avg60=0.00 avg300=0.00 total=1\n")
+    assert io_pressure(str(path)) == 12.5
+    assert io_pressure(str(tmpdir.join("missing"))) is None
+
+
+def test_traverse_throttle():
+    fs = MemoryBackend()
+    for i in range(5):
+        fs.add("dir/file%d" % i)
+    clock = Clock()
+    throttle = Throttle(rate=1, burst=1, max_pressure=0, max_load=0,
+                        clock=clock, sleep=clock.sleep)
+    item, = Traverse(timeout=99, backend=fs, throttle=throttle)(".")
+    assert item.count == 5
+    assert clock.now == 5.0
@@ -0,0 +1,107 @@
+import stat
+
+import pytest
+from git import Repo
+
+from lss import Traverse, NEED_STAT, NEED_MARKERS
+from lss.backend import MemoryBackend
+from lss.cli import main
+from lss.query import Query
+
+
+def mkmemory():
+    fs = MemoryBackend()
+    for i in range(100):
+        fs.add("big/dir%03d/file" % i, size=1 << 20, mtime=1000.0)
+    fs.add("small/file", size=10, mtime=5000.0)
+    fs.add("small/app.log", size=10, mtime=5000.0)
+    fs.add("top.log", size=3, mtime=100.0)
+    return fs
+
+
+def run(text, fs):
+    query = Query(text, now=10000.0)
+    traverse = Traverse(timeout=99, backend=fs, prune=query.prune,
+                        aggregators=query.aggregators)
+    items = list(traverse("."))
+    return {item.name: item for item in items if query.match(item)}, \
+        {item.name: item for item in items}
+
+
+def test_parse_errors():
+    for text in ("size >", "size > 10X", "bogus = 1", "(size > 1",
+                 "size ~ 10"):
+        with pytest.raises(ValueError):
+            Query(text)
+
+
+def test_size_prunes():
+    matched, items = run("size > 10M", mkmemory())
+    assert sorted(matched) == ["big"]
+    # decided true once over 10M, rest of big is not traversed
+    assert 20 < items["big"].count < 200
+    assert not items["big"].complete
+    assert items["small"].complete
+
+
+def test_static_prunes():
+    matched, items = run("type = f and name ~ '*.log'", mkmemory())
+    assert sorted(matched) == ["top.log"]
+    assert items["big"].count == 0
+
+
+def test_age_and_largest():
+    matched, _ = run("age > 6000 and not largest > 1K", mkmemory())
+    assert sorted(matched) == ["top.log"]
+    matched, _ = run("largest >= 1M or age < 2h", mkmemory())
+    assert sorted(matched) == ["big", "small"]
+
+
+def test_largest_files_only():
+    fs = MemoryBackend()
+    fs.add("dir/sub", mode=stat.S_IFDIR | 0o755, size=4096)
+    fs.add("dir/sub/file", size=2)
+    matched, _ = run("largest > 1K", fs)
+    assert not matched
+
+
+def test_needs():
+    assert Query("count > 1 and name ~ 'a*'").needs == frozenset()
+    assert Query("size > 1 or marker = G").needs == {NEED_STAT, NEED_MARKERS}
+    assert Query("owner = root").needs == {NEED_STAT}
+
+
+def test_where_count_fields(tmpdir, capsys):
+    for name, size in (("a", 20000), ("b", 30000), ("c", 10)):
+        tmpdir.join("data", name, "file").write("x" * size, ensure=True)
+    main(["-T", "99", "--fields", "name,count", "--where", "size > 10K",
+          str(tmpdir.join("data"))])
+    lines = capsys.readouterr().out.splitlines()
+    assert sorted(line.split()[0] for line in lines) == ["a", "b"]
+
+
+def test_marker(tmpdir):
+    for name in ("a", "b"):
+        tmpdir.join(name, "sub", "file").write("x", ensure=True)
+    Repo.init(str(tmpdir.join("a", "sub")))
+    query = Query("marker = G")
+    traverse = Traverse(timeout=99, prune=query.prune, needs=query.needs)
+    items = list(traverse(str(tmpdir)))
+    assert [item.name for item in items if query.match(item)] == ["a"]
+
+
+def test_largest_nested_paths(tmpdir, capsys):
+    tmpdir.join("data", "a", "sub", "big").write("x" * 20000, ensure=True)
+    tmpdir.join("data", "b", "small").write("x", ensure=True)
+    data = str(tmpdir.join("data"))
+    main(["-T", "99", "--where", "largest > 10K", data,
+          str(tmpdir.join("data", "a"))])
+    lines = capsys.readouterr().out.splitlines()
+    assert sorted(line.split()[-1] for line in lines) == ["a", "sub"]
+
+
+def test_where_top(tmpdir, capsys):
+    for name in ("a", "b", "c"):
+        tmpdir.join(name).write("x")
+    main(["-T", "99", "--where", "size > 0", "--top", "2", str(tmpdir)])
+    assert len(capsys.readouterr().out.splitlines()) == 2
@@ -0,0 +1,90 @@
+import os
+import sys
+
+import pytest
+
+from lss import snapshot
+from lss.cli import main
+
+
+def mktree(root):
+    for d in range(3):
+        path = os.path.join(str(root), "dir%d" % d, "sub")
+        os.makedirs(path)
+        with open(os.path.join(path, "file"), "wb") as fo:
+            fo.write(bytes(100))
+
+
+def test_snapshot_roundtrip(tmpdir):
+    mktree(tmpdir)
+    path = str(tmpdir.join("snap"))
+    tree = snapshot.scan(str(tmpdir.join("dir0")))
+    snapshot.write(tree, path)
+    loaded = snapshot.SnapshotFile(path)
+    assert len(loaded) == len(tree) == 2
+    assert [loaded.record(i) for i in range(len(loaded))] == tree.records
+    assert [loaded.record(i)[1] for i in loaded.children(0)] == ["sub"]
+    assert snapshot.diff(loaded, snapshot.scan(str(tmpdir.join("dir0")))) \
+        == []
+
+
+def test_diff(tmpdir):
+    mktree(tmpdir)
+    old = snapshot.scan(str(tmpdir))
+    with open(str(tmpdir.join("dir1", "sub", "big")), "wb") as fo:
+        fo.write(bytes(5000))
+    changes = snapshot.diff(old, snapshot.scan(str(tmpdir)))
+    paths = [change.path for change in changes]
+    assert paths[0] == str(tmpdir.join("dir1", "sub"))
+    assert changes[0].own == 5000
+    assert changes[0].count == 1
+    assert not any("dir0" in path or "dir2" in path for path in paths)
+
+
+def test_bad_snapshot(tmpdir, capsys):
+    mktree(tmpdir)
+    path = str(tmpdir.join("snap"))
+    snapshot.write(snapshot.scan(str(tmpdir.join("dir0"))), path)
+    with open(path, "rb") as fo:
+        data = fo.read()
+    for bad in (b"", b"LSS", data[:20], data[:-4], b"x" * len(data)):
+        with open(path, "wb") as fo:
+            fo.write(bad)
+        with pytest.raises(SystemExit):
+            main(["--diff", path, path])
+        assert "--diff:" in capsys.readouterr().err
+
+
+def test_deep_tree(tmpdir):
+    path = str(tmpdir)
+    for _ in range(200):
+        path = os.path.join(path, "d")
+        os.mkdir(path)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(150)
+    try:
+        tree = snapshot.scan(str(tmpdir))
+    finally:
+        sys.setrecursionlimit(limit)
+    assert tree.record(0)[3] == 200
+
+
+def test_stat_error(tmpdir, monkeypatch):
+    mktree(tmpdir)
+    scandir = os.scandir
+
+    class Entry:
+        def __init__(self, entry):
+            self.entry = entry
+            self.name = entry.name
+            self.path = entry.path
+
+        def stat(self, **kwds):
+            if self.name == "dir1":
+                raise FileNotFoundError(self.path)
+            return self.entry.stat(**kwds)
+
+    monkeypatch.setattr(os, "scandir",
+                        lambda path: [Entry(e) for e in scandir(path)])
+    tree = snapshot.scan(str(tmpdir))
+    assert [tree.record(i)[1] for i in tree.children(0)] == ["dir0", "dir2"]